@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# coding=utf8
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+from sys import path
+from time import perf_counter
+
+if str(Path(__file__).resolve().parent.parent) not in path:
+    path.append(str(Path(__file__).resolve().parent.parent))
+
+from beward_cgi.beward_key import Key
+
+"""Замер памяти и времени создания базы ключей beward_key.Key.
+
+Сравнивает компактный Key с прежней реализацией, хранившей параметры
+в __dict__ экземпляра, на выгрузке ключей RFID и MIFARE.
+
+Запуск:
+    python benchmarks/key_memory.py --keys 10000
+"""
+
+
+class LegacyKey(object):
+    """Реализация Key до хранения параметров кортежем."""
+
+    def __init__(self, key_string):
+        self.mifare_pattern = (
+            "Key",
+            "Type",
+            "ProtectedMode",
+            "CipherIndex",
+            "NewCipherEnable",
+            "NewCipherIndex",
+            "Code",
+            "Sector",
+            "Apartment",
+            "Owner",
+            "AutoPersonalize",
+            "Service",
+        )
+        self.rfid_pattern = ("Key", "Apartment")
+        keys_and_params = key_string.split(",")
+        if len(keys_and_params) == 2:
+            key = self._append_params(dict(zip(self.rfid_pattern, keys_and_params)))
+        else:
+            key = dict(zip(self.mifare_pattern, keys_and_params))
+        for k, v in key.items():
+            self.__dict__["param_" + k] = v
+
+    def _append_params(self, key):
+        for param in set(self.mifare_pattern) - set(key):
+            if param == "Owner":
+                key[param] = ""
+            elif param in ["Type", "Sector"]:
+                key[param] = "1"
+            else:
+                key[param] = "0"
+        return key
+
+
+def make_export(count, format_type):
+    if format_type == "RFID":
+        return ["{:014X},{}".format(0x41A1D8B3 + num, num % 300) for num in range(count)]
+    return [
+        "{:014X},1,0,0,0,0,0,1,{},,0,0".format(0x41A1D8B3 + num, num % 300)
+        for num in range(count)
+    ]
+
+
+def measure(key_cls, lines):
+    """Память и время создания ключей из строк выгрузки.
+
+    Returns:
+        tuple: байт на ключ и микросекунд на ключ.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    keys = [key_cls(line) for line in lines]
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keys
+    return size / len(lines), elapsed / len(lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память базы ключей beward_cgi")
+    parser.add_argument("--keys", type=int, default=10000, help="Ключей в базе")
+    args = parser.parse_args()
+
+    for format_type in ("RFID", "MIFARE"):
+        lines = make_export(args.keys, format_type)
+        assert [Key(line).get_key_string(format_type) for line in lines[:10]] == lines[:10]
+        print("{} ({} keys)".format(format_type, args.keys))
+        results = {}
+        for name, key_cls in (("legacy", LegacyKey), ("Key", Key)):
+            results[name] = measure(key_cls, lines)
+            print("  {:<8} {:>10.1f} bytes/key {:>10.2f} us/key".format(
+                name,
+                *results[name]
+            ))
+        print("  memory: {:.2f}x less".format(results["legacy"][0] / results["Key"][0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# coding=utf8
+from collections import OrderedDict
+from pathlib import Path
+from sys import path
+from timeit import repeat
+
+if str(Path(__file__).resolve().parent.parent) not in path:
+    path.append(str(Path(__file__).resolve().parent.parent))
+
+from beward_cgi.general.client import BewardClient
+
+"""Микробенчмарк BewardClient.parse_response.
+
+Сравнивает однопроходный разбор с прежней реализацией на ответах
+action=get и на выгрузке ключей action=export.
+
+Запуск:
+    python benchmarks/parse_response.py
+"""
+
+
+class FakeResponse(object):
+    """Ответ панели с уже прочитанным телом."""
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+def legacy_parse_response(response):
+    """Реализация parse_response до однопроходного разбора."""
+
+    content = response.content.decode("UTF-8").replace("\r", "").split("\n")
+    content = [line for line in content if line]
+    parse_content = OrderedDict()
+
+    for number, line in enumerate(content):
+        try:
+            line = str(line).split("=")
+        except UnicodeEncodeError:
+            line = line.split("=")
+
+        if len(line) == 2:
+            parse_content[line[0]] = line[1]
+        elif len(line) == 1 and len(content) == 1:
+            parse_content["message"] = line[0]
+        elif len(line) == 1:
+            parse_content["message_{}".format(number)] = line[0]
+        else:
+            parse_content["message_{}".format(number)] = ";".join(line)
+
+    if "message" not in parse_content:
+        parse_content["message"] = ""
+
+    return {
+        "code": response.status_code,
+        "content": parse_content,
+    }
+
+
+def make_get_body(params=40):
+    lines = ["Param{0}=Value{0}".format(num) for num in range(params)]
+    return ("\r\n".join(lines) + "\r\n").encode("UTF-8")
+
+
+def make_export_body(keys=50000):
+    lines = [
+        "{:014X},1,0,0,0,0,0,1,{},,0,0".format(0x41A1D8B3 + num, num % 300)
+        for num in range(keys)
+    ]
+    return ("\r\n".join(lines) + "\r\n").encode("UTF-8")
+
+
+def bench(name, func, number, repeat_count=5):
+    best = min(repeat(func, number=number, repeat=repeat_count)) / number
+    print("{:<40} {:>12.1f} us".format(name, best * 1e6))
+    return best
+
+
+def main():
+    client = BewardClient.__new__(BewardClient)
+    cases = (
+        ("get (40 params)", FakeResponse(make_get_body()), 2000),
+        ("export (50k keys)", FakeResponse(make_export_body()), 5),
+    )
+    for title, response, number in cases:
+        assert legacy_parse_response(response)["content"] == (
+            client.parse_response(FakeResponse(response.content))["content"]
+        )
+        print(title)
+        legacy = bench("  legacy", lambda: legacy_parse_response(response), number)
+        # Новый ответ на каждый вызов, чтобы не измерять сохраненный разбор
+        current = bench(
+            "  parse_response",
+            lambda: client.parse_response(FakeResponse(response.content)),
+            number,
+        )
+        bench(
+            "  parse_response (shared response)",
+            lambda: client.parse_response(response),
+            number,
+        )
+        bench(
+            "  parse_response(stream=True)",
+            lambda: client.parse_response(response, stream=True),
+            number,
+        )
+        print("  speedup: {:.2f}x".format(legacy / current))
+
+
+if __name__ == "__main__":
+    main()
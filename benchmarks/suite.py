@@ -0,0 +1,343 @@
+#!/usr/bin/python
+# coding=utf8
+import argparse
+import inspect
+import json
+import pkgutil
+from contextlib import redirect_stdout
+from datetime import datetime
+from functools import partial
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from platform import platform, python_version
+from statistics import mean, median
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+if str(Path(__file__).resolve().parent.parent) not in path:
+    path.append(str(Path(__file__).resolve().parent.parent))
+
+import beward_cgi
+from beward_cgi.beward_key import Key
+from beward_cgi.general.client import BewardClient
+from beward_cgi.general.module import BewardIntercomModule
+from beward_toolkit.scripts.simulator import PanelSimulator
+
+"""Набор замеров скорости модулей и обработки парка панелей.
+
+Замеры выполняются на симуляторе панелей beward_toolkit.scripts.simulator:
+    modules - load_params/set_params/get_dump каждого модуля BewardIntercomModule;
+    keys - выгрузка и загрузка базы ключей RfidModule и MifareModule;
+    fleet - панелей в секунду для panel.make_dump,
+        keys.upload_keys_from_eqm_file и snapshot.get_snapshot_hosts.
+
+Результаты сохраняются в JSON. С --baseline выводится сравнение с
+результатами предыдущего запуска.
+
+Запуск:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --sections fleet --panels 200 --latency 0.02
+"""
+
+SECTIONS = ("modules", "keys", "fleet")
+USERNAME = "admin"
+PASSWORD = "admin"
+# Аргументы методов, которые иначе ждут панель
+METHOD_KWARGS = {
+    "IntercomduModule": {"set_params": {"fill_kkm_timeout": 0}},
+}
+# Модули, которым нужна панель с ключами RFID
+RFID_MODULES = ("RfidModule",)
+
+
+def summarize(samples):
+    """Статистика замеров в миллисекундах."""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(mean(ordered) * 1000, 3),
+        "median_ms": round(median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def measure(func, repeat):
+    """Замер времени вызова func.
+
+    Returns:
+        dict: статистика замеров или описание ошибки первого вызова.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        try:
+            func()
+        except Exception as err:
+            return {"error": "{}: {}".format(type(err).__name__, err)}
+        samples.append(perf_counter() - start)
+    return summarize(samples)
+
+
+def iter_module_classes():
+    """Все подклассы BewardIntercomModule пакета beward_cgi."""
+    seen = set()
+    for info in pkgutil.iter_modules(beward_cgi.__path__):
+        module = import_module("beward_cgi." + info.name)
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if (
+                issubclass(cls, BewardIntercomModule)
+                and cls is not BewardIntercomModule
+                and cls.__module__ == module.__name__
+                and cls not in seen
+            ):
+                seen.add(cls)
+                yield cls
+
+
+def full_set_params(module, **kwargs):
+    """set_params с записью всех параметров.
+
+    После load_params модуль отправляет только измененные параметры, и
+    повторный set_params без изменений ничего не записывает.
+    """
+    module.reset_loaded_params()
+    return module.set_params(**kwargs)
+
+
+def bench_modules(mifare_simulator, rfid_simulator, args):
+    """Задержка load_params/set_params/get_dump для каждого модуля.
+
+    set_params замеряется с записью всех параметров через full_set_params.
+    """
+    mifare_client = BewardClient(mifare_simulator.addresses[0], USERNAME, PASSWORD)
+    rfid_client = BewardClient(rfid_simulator.addresses[0], USERNAME, PASSWORD)
+    results = {}
+    for cls in iter_module_classes():
+        client = rfid_client if cls.__name__ in RFID_MODULES else mifare_client
+        module = cls(client=client)
+        kwargs = METHOD_KWARGS.get(cls.__name__, {})
+        methods = {
+            "load_params": module.load_params,
+            "set_params": partial(full_set_params, module),
+            "get_dump": module.get_dump,
+        }
+        results[cls.__name__] = {
+            name: measure(
+                lambda: func(**kwargs.get(name, {})),
+                args.repeat,
+            )
+            for name, func in methods.items()
+        }
+    mifare_client.close()
+    rfid_client.close()
+    return results
+
+
+def bench_keys(args):
+    """Скорость выгрузки и загрузки базы ключей."""
+    from beward_cgi.mifare import MifareModule
+    from beward_cgi.rfid import RfidModule
+
+    results = {}
+    for key_type, module_cls in (("RFID", RfidModule), ("MIFARE", MifareModule)):
+        with PanelSimulator(panels=1, key_type=key_type, keys=args.keys) as simulator:
+            client = BewardClient(simulator.addresses[0], USERNAME, PASSWORD)
+            module = module_cls(client=client)
+            export = measure(module.load_keys_from_panel, args.repeat)
+            upload = measure(module.upload_keys, args.repeat)
+            client.close()
+        for name, stats in (("export", export), ("import", upload)):
+            if "mean_ms" in stats:
+                stats["keys_per_second"] = round(args.keys / (stats["mean_ms"] / 1000), 1)
+            stats["keys"] = args.keys
+            results["{}.{}".format(module_cls.__name__, name)] = stats
+    return results
+
+
+def make_keys(count):
+    return [
+        Key("{:014X},{}".format(0x51A1D8B3 + num, num % 100 + 1)).get_key_string("RFID")
+        for num in range(count)
+    ]
+
+
+def run_fleet(func, panels):
+    """Замер обработки парка панелей.
+
+    Returns:
+        dict: время, количество панелей и панелей в секунду.
+    """
+    start = perf_counter()
+    try:
+        with redirect_stdout(StringIO()):
+            func()
+    except Exception as err:
+        return {"error": "{}: {}".format(type(err).__name__, err)}
+    elapsed = perf_counter() - start
+    return {
+        "panels": panels,
+        "seconds": round(elapsed, 3),
+        "panels_per_second": round(panels / elapsed, 2),
+    }
+
+
+def bench_fleet(simulator, args):
+    """Панелей в секунду для скриптов обработки парка.
+
+    Скрипты загружают настройки пакета (config.settings), поэтому без
+    базы паролей раздел пропускается.
+    """
+    try:
+        from beward_toolkit.scripts import keys, panel, snapshot
+        from beward_toolkit.scripts.general_solutions import run_command_to_seqens
+    except Exception as err:
+        return {"skipped": "{}: {}".format(type(err).__name__, err)}
+
+    addresses = list(simulator.addresses)
+    eqm_keys = make_keys(args.keys)
+    results = {}
+    results["panel.make_dump"] = run_fleet(
+        lambda: run_command_to_seqens(
+            panel.make_dump,
+            ((address, USERNAME, PASSWORD) for address in addresses),
+            ("ip", "username", "password"),
+            args.threads,
+        ),
+        len(addresses),
+    )
+    results["keys.upload_keys_from_eqm_file"] = run_fleet(
+        lambda: keys.upload_keys_from_eqm_file(
+            username=USERNAME,
+            password=PASSWORD,
+            keys=eqm_keys,
+            func="string",
+            string=addresses,
+            thread=args.threads,
+        ),
+        len(addresses),
+    )
+    with TemporaryDirectory() as save_path:
+        results["snapshot.get_snapshot_hosts"] = run_fleet(
+            lambda: snapshot.get_snapshot_hosts(
+                hosts=addresses,
+                username=USERNAME,
+                password=PASSWORD,
+                thread_num=args.threads,
+                save_path=save_path,
+            ),
+            len(addresses),
+        )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Вывод метрик, изменившихся больше чем на threshold."""
+
+    def _flatten(tree, prefix=""):
+        for key, value in tree.items():
+            name = prefix + key
+            if isinstance(value, dict):
+                for item in _flatten(value, name + "."):
+                    yield item
+            elif isinstance(value, (int, float)) and (
+                name.endswith("_ms") or name.endswith("_per_second")
+            ):
+                yield name, value
+
+    old = dict(_flatten(baseline.get("results", {})))
+    for name, value in _flatten(results.get("results", {})):
+        if not old.get(name):
+            continue
+        change = (value - old[name]) / old[name]
+        # Для пропускной способности рост - улучшение
+        worse = -change if name.endswith("_per_second") else change
+        if abs(change) >= threshold:
+            print("{:<70} {:>10} -> {:<10} {:+.1%}{}".format(
+                name,
+                old[name],
+                value,
+                change,
+                "  REGRESSION" if worse > 0 else "",
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры скорости beward_cgi")
+    parser.add_argument("--sections", default=",".join(SECTIONS),
+                        help="Разделы через запятую: %s" % ",".join(SECTIONS))
+    parser.add_argument("--panels", type=int, default=50, help="Панелей для fleet")
+    parser.add_argument("--threads", type=int, default=16, help="Потоков для fleet")
+    parser.add_argument("--keys", type=int, default=5000, help="Ключей на панели")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов замера")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка панели, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки, с")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Доля ответов с ошибкой 500")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора")
+    parser.add_argument("--output", default="benchmark-results.json",
+                        help="Файл результатов JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="Файл результатов для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Порог изменения для вывода сравнения")
+    args = parser.parse_args()
+    sections = [name for name in args.sections.split(",") if name]
+    simulator_kwargs = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "seed": args.seed,
+    }
+
+    results = {}
+    if "modules" in sections:
+        print("modules...")
+        with PanelSimulator(
+            panels=1,
+            key_type="MIFARE",
+            keys=100,
+            **simulator_kwargs
+        ) as mifare_simulator, PanelSimulator(
+            panels=1,
+            key_type="RFID",
+            keys=100,
+            **simulator_kwargs
+        ) as rfid_simulator:
+            results["modules"] = bench_modules(mifare_simulator, rfid_simulator, args)
+    if "keys" in sections:
+        print("keys...")
+        results["keys"] = bench_keys(args)
+    if "fleet" in sections:
+        print("fleet...")
+        with PanelSimulator(
+            panels=args.panels,
+            key_type="RFID",
+            keys=100,
+            **simulator_kwargs
+        ) as simulator:
+            results["fleet"] = bench_fleet(simulator, args)
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": python_version(),
+            "platform": platform(),
+            "config": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="UTF-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print("Результаты сохранены в %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="UTF-8") as file:
+            compare(report, json.load(file), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
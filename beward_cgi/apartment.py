@@ -1,8 +1,10 @@
 #!/usr/bin/python
 # coding=utf8
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 
 from .general.module import BewardIntercomModule, BewardIntercomModuleError
+from .general.params import ParamStore
 
 LOGGER = getLogger(__name__)
 
@@ -59,23 +61,28 @@ class ApartmentModule(BewardIntercomModule):
                 continue
 
             try:
-                self.__dict__["param_" + str(key)] = str(value)
+                self.params[str(key)] = str(value)
             except UnicodeEncodeError:
-                self.__dict__["param_" + str(key)] = value
+                self.params[str(key)] = value
+
+        self._mark_loaded()
 
     def set_params(self):
-        """Метод загрузки параметров на панель панели."""
+        """Метод загрузки параметров на панель панели.
 
-        params = self.get_params()
+        Отправляются только измененные параметры и номер квартиры.
+        """
+
+        params = self.get_changed_params()
+        if not params:
+            LOGGER.debug("Квартира {}: параметры не изменились.".format(
+                self.apartment_number,
+            ))
+            return True
         params["action"] = "set"
         params["Number"] = self.apartment_number
         response = self.client.query(setting=self.cgi, params=params)
-
-        if response.status_code != 200:
-            raise BewardIntercomModuleError("Error, %s" % response.status_code)
-
-        LOGGER.debug("", response)
-        return True
+        return self._set_response(response)
 
     def generate_code(
         self,
@@ -111,14 +118,19 @@ class ApartmentModule(BewardIntercomModule):
             config(dict): конфигурация панели.
 
         """
-        for key, value in config.items():
-            self.__dict__["param_" + key] = value
-            LOGGER.debug("Param %s set to %s.", key, value)
+        self.params.update(config)
+        LOGGER.debug("Params set to %s.", config)
         return True
 
 
 class ApartmentsModule(BewardIntercomModule):
-    """Модуль взаимодействия со списками квартир через cgi apartment_cgi"""
+    """Модуль взаимодействия со списками квартир через cgi apartment_cgi
+
+    Квартиры хранятся в self.apartments по номеру, атрибуты app_<номер>
+    читают и записывают соответствующую квартиру.
+    """
+
+    ATTRIBUTE_STORES = (("param_", "params"), ("app_", "apartments"))
 
     def __init__(
         self,
@@ -128,6 +140,7 @@ class ApartmentsModule(BewardIntercomModule):
         password=None,
         cgi="cgi-bin/apartment_cgi",
     ):
+        self.apartments = ParamStore()
         super(ApartmentsModule, self).__init__(
             client,
             ip,
@@ -136,8 +149,15 @@ class ApartmentsModule(BewardIntercomModule):
             cgi,
         )
 
-    def load_params(self):
-        """Метод получения параметров установленных на панели."""
+    def load_params(self, max_workers=8):
+        """Метод получения параметров установленных на панели.
+
+        Параметры квартир запрашиваются параллельно через общий клиент,
+        квартиры добавляются в модуль в порядке списка панели.
+
+        Args:
+            max_workers (int): количество одновременных запросов квартир.
+        """
 
         response = self.client.query(
             setting=self.cgi,
@@ -155,25 +175,31 @@ class ApartmentsModule(BewardIntercomModule):
                 "Parsing error. Response: {}".format(content["message"]),
             )
         appartments_nums = [content[item] for item in content if "Number" in item]
-        for num in appartments_nums:
+
+        def _load(num):
             app = ApartmentModule(client=self.client, apartment_number=num)
             app.load_params()
-            self.__dict__["app_" + num] = app
+            return app
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for num, app in zip(appartments_nums, executor.map(_load, appartments_nums)):
+                self.apartments[num] = app
 
     def get_params(self):
         """Получить параметры с панели."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if key[:4] == "app_":
-                params.update({key[4:]: value.get_params()})
-        return params
+        return {num: app.get_params() for num, app in self.apartments.items()}
+
+    def reset_loaded_params(self):
+        """Забыть загруженные параметры модуля и всех квартир."""
+        super(ApartmentsModule, self).reset_loaded_params()
+        for app in self.apartments.values():
+            app.reset_loaded_params()
 
     def set_params(self):
         """Метод загрузки параметров на панель панели."""
 
-        for key, value in self.__dict__.items():
-            if key[:4] == "app_":
-                value.set_params()
+        for app in self.apartments.values():
+            app.set_params()
 
         return True
 
@@ -191,7 +217,7 @@ class ApartmentsModule(BewardIntercomModule):
         if update is None:
             update = {}
         for appartment_num in appartment_nums:
-            app = self.__dict__.get("app_" + appartment_num)
+            app = self.apartments.get(appartment_num)
             app.update_params(update=update)
 
         return True
@@ -207,7 +233,7 @@ class ApartmentsModule(BewardIntercomModule):
             raise BewardIntercomModuleError("Module config not found.")
 
         for key, value in module_config.items():
-            self.__dict__["param_" + key] = ApartmentModule(
+            self.params[key] = ApartmentModule(
                 client=self.client,
             ).set_dump(value)
             LOGGER.debug("Param %s set to %s.", key, value)
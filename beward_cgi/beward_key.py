@@ -1,10 +1,18 @@
 #!/usr/bin/python
 # coding=utf8
-from re import findall
+from re import compile as re_compile
+from sys import intern
 
 """Модуль содержащий класс хранения ключа
 """
 
+KEY_PATTERN = re_compile(r"[0-9A-F]{2,}")
+
+
+def _intern(value):
+    """Общая копия для повторяющихся значений параметров (квартиры, типы)."""
+    return intern(value) if type(value) is str else value
+
 
 class Key(object):
     """Класс для хранения ключа
@@ -59,13 +67,48 @@ class Key(object):
         Можно передавать не все параметры, в таком случае надо оставлять запятые
         00000041A1D8B3,,,,,,,,,,0,0
         00000041A1D8B3,
-    Распаршивает ее в атрибуты экземпляра класса
+    Распаршивает ее в параметры ключа, доступные как атрибуты param_<имя>
     Может вернуть ключ формате атрибутов для дальнейщего запроса:
         get_params
     Может вернуть ключ формате строки для csv:
         get_key_string
     """
 
+    # Шаблоны и значения по умолчанию общие для всех ключей
+    mifare_pattern = (
+        "Key",
+        "Type",
+        "ProtectedMode",
+        "CipherIndex",
+        "NewCipherEnable",
+        "NewCipherIndex",
+        "Code",
+        "Sector",
+        "Apartment",
+        "Owner",
+        "AutoPersonalize",
+        "Service",
+    )
+    rfid_pattern = ("Key", "Apartment")
+    default_params = {
+        "Type": "1",
+        "ProtectedMode": "0",
+        "CipherIndex": "0",
+        "NewCipherEnable": "0",
+        "NewCipherIndex": "0",
+        "Code": "0",
+        "Sector": "1",
+        "Apartment": "0",
+        "Owner": "",
+        "AutoPersonalize": "0",
+        "Service": "0",
+    }
+    _param_index = {param: num for num, param in enumerate(mifare_pattern)}
+
+    # Параметры хранятся кортежем в порядке mifare_pattern, параметры
+    # не из шаблона - в словаре _extra_params
+    __slots__ = ("_values", "_extra_params")
+
     def __init__(self, key_string=None, key_params=None):
         """Инициализация обьекта ключа
 
@@ -73,21 +116,7 @@ class Key(object):
             key_string (str): ключ и параметры ключа в строке
             key_params (dict): ключ и параметры ключа в словаре
         """
-        self.mifare_pattern = (
-            "Key",
-            "Type",
-            "ProtectedMode",
-            "CipherIndex",
-            "NewCipherEnable",
-            "NewCipherIndex",
-            "Code",
-            "Sector",
-            "Apartment",
-            "Owner",
-            "AutoPersonalize",
-            "Service",
-        )
-        self.rfid_pattern = ("Key", "Apartment")
+        self._extra_params = None
         if key_string is None and key_params is None:
             raise ValueError("Need key_string or key_params")
         if key_string is not None:
@@ -102,6 +131,37 @@ class Key(object):
     def __repr__(self):
         return "Key({})".format(self.get_key_string())
 
+    def __getattr__(self, name):
+        """Доступ к параметрам ключа как к атрибутам param_<имя>."""
+        if name[:6] == "param_":
+            param = name[6:]
+            num = self._param_index.get(param)
+            if num is not None:
+                return self._values[num]
+            if self._extra_params and param in self._extra_params:
+                return self._extra_params[param]
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name),
+        )
+
+    def __setattr__(self, name, value):
+        if name[:6] == "param_":
+            self._set_param(name[6:], value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def _set_param(self, param, value):
+        """Изменить параметр ключа."""
+        num = self._param_index.get(param)
+        if num is None:
+            if self._extra_params is None:
+                self._extra_params = {}
+            self._extra_params[param] = value
+            return
+        values = list(self._values)
+        values[num] = _intern(value) if num else value
+        self._values = tuple(values)
+
     def _initializations_key(self, key_string):
         """Инициализация атрибутов экземпляра класса.
 
@@ -123,52 +183,47 @@ class Key(object):
         """
         if not isinstance(key_string, str):
             raise TypeError("Is not string")
-        key_pattern = r"[0-9A-F]{2,}"
-        if not findall(key_pattern, key_string):
+        if KEY_PATTERN.search(key_string) is None:
             raise ValueError("Key is not found")
         keys_and_params = key_string.split(",")
-        if len(keys_and_params) == 1:
-            key = {"Key": keys_and_params[0]}
-            key = self._append_params(key)
-        elif len(keys_and_params) == 2:
-            if not keys_and_params[1]:
-                keys_and_params[1] = "0"
-            key = dict(zip(self.rfid_pattern, keys_and_params))
-            key = self._append_params(key)
-        elif len(keys_and_params) == 12:
-            key = dict(zip(self.mifare_pattern, keys_and_params))
+        if len(keys_and_params) == 12:
+            values = keys_and_params[:1]
+            values.extend(_intern(value) for value in keys_and_params[1:])
+            # Обработка неизвестных ключей с Type == -1
+            if values[1] == "-1":
+                values[1] = "1"
+        elif len(keys_and_params) in (1, 2):
+            values = [self.default_params.get(param) for param in self.mifare_pattern]
+            values[0] = keys_and_params[0]
+            if len(keys_and_params) == 2 and keys_and_params[1]:
+                values[8] = _intern(keys_and_params[1])
         else:
             raise ValueError("Wrong number of parameters")
-        for k, v in key.items():
-            self.__dict__["param_" + k] = v
-
-        # Обработка неизвестных ключей с Type == -1
-        if str(self.__dict__["param_Type"]) == "-1":
-            self.__dict__["param_Type"] = "1"
-
+        self._values = tuple(values)
 
-    def _append_params(self, key):
-        """Метод добавление несуществующих параметров ключа"""
-        for param in set(self.mifare_pattern) - set(key):
-            if param == "Owner":
-                key[param] = ""
-            elif param in ["Type", "Sector"]:
-                key[param] = "1"
-            else:
-                key[param] = "0"
-        return key
+    def _load_values(self, key):
+        """Сохранить параметры ключа, недостающие заполняются по умолчанию."""
+        defaults = self.default_params
+        values = [key["Key"]]
+        for param in self.mifare_pattern[1:]:
+            values.append(_intern(key.get(param, defaults[param])))
+        self._values = tuple(values)
+        if not key.keys() <= self._param_index.keys():
+            self._extra_params = {
+                param: value
+                for param, value in key.items()
+                if param not in self._param_index
+            }
 
     def get_params(self, format_type="MIFARE"):
         """Получить параметры ключа."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if "param_" == key[:6]:
-                key = key.replace("param_", "")
-                params.update({key: value})
         if format_type == "MIFARE":
+            params = dict(zip(self.mifare_pattern, self._values))
+            if self._extra_params:
+                params.update(self._extra_params)
             return params
         elif format_type == "RFID":
-            return {"Key": params["Key"], "Apartment": params["Apartment"]}
+            return {"Key": self._values[0], "Apartment": self._values[8]}
         return {}
 
     def get_key_string(self, format_type="MIFARE"):
@@ -177,15 +232,10 @@ class Key(object):
         Args:
             format_type (str, optional): формат строки. Defaults to "MIFARE".
         """
-        end_string = ""
         if format_type == "MIFARE":
-            for param in self.mifare_pattern:
-                end_string += self.__dict__["param_" + param] + ","
-            return end_string[:-1]
+            return ",".join(self._values)
         elif format_type == "RFID":
-            for param in self.rfid_pattern:
-                end_string += self.__dict__["param_" + param] + ","
-            return end_string[:-1]
+            return self._values[0] + "," + self._values[8]
         return ""
 
     def load_key_from_params(self, params):
@@ -196,9 +246,7 @@ class Key(object):
         """
         if "Key" not in params:
             raise ValueError("Key is not found")
-        key = self._append_params(params)
-        for k, v in key.items():
-            self.__dict__["param_" + k] = v
+        self._load_values(params)
 
 
 if __name__ == "__main__":
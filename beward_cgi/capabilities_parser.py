@@ -1,6 +1,6 @@
 #!/usr/bin/python
 # coding=utf8
-
+from .general.params import ParamAttributesMixin, ParamStore
 
 """Модуль содержащий класс хранения прав
 """
@@ -130,8 +130,12 @@ CAPABILITIES_PATTERNS = {
 }
 
 
-class Capabilities(object):
-    """Класс хранения прав"""
+class Capabilities(ParamAttributesMixin):
+    """Класс хранения прав
+
+    Права хранятся в self.params, атрибуты param_<имя> читают и записывают
+    соответствующее право.
+    """
 
     def __init__(self, capabilities_string=None, capabilities_params=None):
         """Инициализация обьекта ключа
@@ -140,6 +144,7 @@ class Capabilities(object):
             capabilities_string (str): права в строке
             capabilities_params (dict): права в словаре
         """
+        self.params = ParamStore()
         if capabilities_string is None and capabilities_params is None:
             raise ValueError("Need capabilities_string or capabilities_params")
         if capabilities_string is not None:
@@ -167,9 +172,7 @@ class Capabilities(object):
         capabilities_pattern = CAPABILITIES_PATTERNS.get(self.len_params, None)
         if capabilities_pattern is None:
             raise ValueError("Pattern not found")
-        capabilities_params = dict(zip(capabilities_pattern, capabilities_params))
-        for k, v in capabilities_params.items():
-            self.__dict__["param_" + k] = v
+        self.params.update(zip(capabilities_pattern, capabilities_params))
 
     def load_capabilities_from_params(self, capabilities_params):
         """Загрузить парметры из словаря
@@ -177,25 +180,20 @@ class Capabilities(object):
         Args:
             capabilities_params (dict): словарь параметров
         """
-        for k, v in capabilities_params.items():
-            self.__dict__["param_" + k] = v
+        self.params.update(capabilities_params)
         return True
 
     def get_params(self, localization=True):
         """Получить параметры прав."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if "param_" == key[:6]:
-                key = key.replace("param_", "")
-                if localization:
-                    key = CAPABILITIES_PATTERNS["Localization"].get(key, key)
-                params.update({key: value})
-        return params
+        if not localization:
+            return dict(self.params)
+        localization = CAPABILITIES_PATTERNS["Localization"]
+        return {localization.get(key, key): value for key, value in self.params.items()}
 
     def get_key_string(self):
         key_string = ""
         for key in CAPABILITIES_PATTERNS.get(self.len_params, []):
-            key_string += self.__dict__["param_" + key] + ","
+            key_string += self.params[key] + ","
         return key_string[:-1]
 
     def update_params(self, update=None, *args, **kwargs):
@@ -210,13 +208,7 @@ class Capabilities(object):
 
         if update is None:
             update = {}
-        for key, value in update.items():
-            item = self.__dict__.get("param_" + key, None)
-
-            if item is None:
-                continue
-
-            self.__dict__["param_" + key] = value
+        self.params.update_existing(update)
 
         return True
 
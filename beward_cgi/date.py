@@ -8,6 +8,11 @@ from .general.module import BewardIntercomModule, BewardIntercomModuleError
 class DateModule(BewardIntercomModule):
     """Модуль взаимодействия с cgi date_cgi"""
 
+    # Дата и время устанавливаются только всеми параметрами вместе
+    diff_set_params = False
+    # Установка даты меняет настройки NTP на панели
+    invalidates = ("cgi-bin/ntp_cgi",)
+
     def __init__(
         self,
         client=None,
@@ -47,19 +52,17 @@ class DateModule(BewardIntercomModule):
                 continue
 
             try:
-                self.__dict__["param_" + str(key)] = str(value)
+                self.params[str(key)] = str(value)
             except UnicodeEncodeError:
-                self.__dict__["param_" + str(key)] = value
+                self.params[str(key)] = value
 
-        self.__dict__["param_timezone"] = BewardTimeZone(
-            int(self.__dict__["param_timezone"]),
-        )
+        self.params["timezone"] = BewardTimeZone(int(self.params["timezone"]))
 
     def get_params(self):
         """Получить параметры с панели"""
         params = {}
         params = super().get_params()
-        params.update({"timezone": self.__dict__["param_timezone"].get_value()})
+        params.update({"timezone": self.params["timezone"].get_value()})
         return params
 
 
@@ -1,4 +1,8 @@
-from .general.module import BewardIntercomModule, BewardIntercomModuleError
+from .general.module import (
+    BewardIntercomModule,
+    BewardIntercomModuleError,
+    invalidate_loaded_params,
+)
 
 
 class FactoryDefaultModule(BewardIntercomModule):
@@ -33,6 +37,7 @@ class FactoryDefaultModule(BewardIntercomModule):
         """Запрос сброса настроек с сохранением сети и настроек квартир."""
 
         response = self.client.query(setting=self.cgi)
+        invalidate_loaded_params(self.client.ip)
         response = self.client.parse_response(response)
         content = response.get("content", {})
 
@@ -44,6 +49,7 @@ class FactoryDefaultModule(BewardIntercomModule):
         """Запрос сброса настроек с сохранением сети и настроек квартир."""
 
         response = self.client.query(setting="cgi-bin/hardfactorydefault_cgi")
+        invalidate_loaded_params(self.client.ip)
         response = self.client.parse_response(response)
         content = response.get("content", {})
 
@@ -0,0 +1,272 @@
+#!/usr/bin/python
+# coding=utf8
+import asyncio
+from logging import getLogger
+
+try:
+    import aiohttp
+except ImportError as err:
+    raise ImportError(
+        "Асинхронному клиенту нужен пакет aiohttp: pip install aiohttp",
+    ) from err
+
+from .breaker import BREAKERS, RETRY_POLICIES, get_operation_type
+from .cache import make_auth_key, make_cache_key
+from .client import BewardClient
+
+LOGGER = getLogger(__name__)
+
+"""Асинхронные клиенты для работы с панелями на одном event loop.
+
+Клиент использует те же выключатели BREAKERS, политики RETRY_POLICIES и
+ResponseCache, что и синхронный Client. Объединение запросов SingleFlight
+построено на потоках и здесь не используется.
+"""
+
+# Ошибки, при которых панель не получила запрос
+CONNECT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,)
+    if hasattr(aiohttp, "ConnectionTimeoutError")
+    else ()
+)
+
+
+def is_retryable(policy, err):
+    """Аналог RetryPolicy.is_retryable для ошибок aiohttp."""
+    if isinstance(err, CONNECT_ERRORS):
+        return True
+    return policy.retry_read_errors
+
+
+class AsyncResponse(object):
+    """Прочитанный ответ асинхронного клиента.
+
+    Повторяет атрибуты requests.Response, которые используются модулями,
+    поэтому parse_response работает с ним без изменений.
+    """
+
+    def __init__(self, status_code, content, headers=None, url=""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+    def __repr__(self):
+        return "<AsyncResponse [{}]>".format(self.status_code)
+
+    @property
+    def text(self):
+        return self.content.decode("UTF-8", errors="replace")
+
+
+class AsyncClient(object):
+    """Асинхронный класс для работы с запросами к оборудованию.
+
+    Сессия aiohttp создается лениво внутри работающего event loop.
+    Можно передать общую сессию, тогда тысячи клиентов используют
+    один пул соединений, а клиент ее не закрывает.
+    """
+
+    def __init__(
+        self,
+        ip=None,
+        login=None,
+        password=None,
+        session=None,
+        limit_per_host=4,
+        breaker=None,
+        retry_policies=None,
+        cache=None,
+    ):
+        """Инициаизация асинхронного клиента для связи с панелью.
+
+        Args:
+            session (aiohttp.ClientSession, optional): общая сессия.
+            breaker (CircuitBreaker, optional): выключатель панели. По умолчанию
+                общий с синхронными клиентами этого адреса из BREAKERS.
+            retry_policies (dict, optional): политики повторов по типам
+                операций "read", "write", "upload". По умолчанию RETRY_POLICIES.
+            cache (ResponseCache, optional): кэш ответов action=get/list/export.
+                По умолчанию запросы не кэшируются.
+        """
+
+        LOGGER.debug("Инициализация экземпляра класса асинхронного клиента")
+        self.ip = ip
+        self.login = login
+        self.password = password
+        self.auth_key = make_auth_key(login, password)
+        self.limit_per_host = limit_per_host
+        self.breaker = breaker if breaker is not None else BREAKERS.get(ip)
+        self.retry_policies = dict(RETRY_POLICIES)
+        self.retry_policies.update(retry_policies or {})
+        self.cache = cache
+        self.session = session
+        self._own_session = session is None
+
+    def create_session(self):
+        LOGGER.debug("Создание асинхронной сессии с  ip: {}.".format(self.ip))
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ssl=False)
+        return aiohttp.ClientSession(connector=connector)
+
+    def get_url(self, proto="http", setting=None):
+        url = "{protocol}://".format(protocol=proto)
+
+        if self.ip:
+            url += "{host}/".format(host=self.ip)
+
+        if setting:
+            url += "{setting}".format(setting=setting)
+
+        LOGGER.debug("Ссылка создана: {}".format(url))
+        return url
+
+    async def _request(self, method, url, operation, timeout, **kwargs):
+        """Выполнение запроса через выключатель панели с повторами.
+
+        Повторы и учет ошибок такие же, как в Client._request: политика
+        выбирается по типу операции, выключатель получает одну ошибку после
+        исчерпания повторов.
+
+        Raises:
+            CircuitOpenError: панель недавно не отвечала, запрос не отправлен.
+        """
+        if self.session is None:
+            self.session = self.create_session()
+            self._own_session = True
+
+        policy = self.retry_policies[operation]
+        auth = aiohttp.BasicAuth(self.login or "", self.password or "")
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        attempt = 0
+
+        self.breaker.before_call()
+        recorded = False
+        try:
+            while True:
+                try:
+                    async with self.session.request(
+                        method,
+                        url,
+                        auth=auth,
+                        timeout=client_timeout,
+                        **kwargs
+                    ) as response:
+                        content = await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    if attempt >= policy.total or not is_retryable(policy, err):
+                        recorded = True
+                        self.breaker.record_failure()
+                        raise
+                    delay = policy.get_backoff(attempt)
+                    attempt += 1
+                    LOGGER.debug(
+                        "Повтор {} запроса {} через {} с: {}".format(
+                            operation,
+                            url,
+                            delay,
+                            err,
+                        ),
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                recorded = True
+                self.breaker.record_success()
+                return AsyncResponse(
+                    response.status,
+                    content,
+                    dict(response.headers),
+                    str(response.url),
+                )
+        finally:
+            if not recorded:
+                self.breaker.release_trial()
+
+    async def query(self, setting=None, params=None, timeout=5, verify=False):
+        url = self.get_url(setting=setting)
+        LOGGER.debug("Запрос:{host}.".format(host=url))
+        operation = get_operation_type("GET", setting, params)
+        kwargs = {}
+
+        if params:
+            LOGGER.debug("Param load: {}".format(params))
+            kwargs["params"] = params
+
+        if operation == "read":
+            key = make_cache_key(self.ip, setting, params, self.auth_key)
+            cacheable = self.cache is not None and self.cache.is_cacheable(params)
+            if cacheable:
+                response = self.cache.get(key)
+                if response is not None:
+                    LOGGER.debug("Ответ из кэша: {} {}".format(url, params))
+                    return response
+            response = await self._request("GET", url, operation, timeout, **kwargs)
+            if cacheable and response.status_code == 200:
+                self.cache.set(key, response)
+            return response
+
+        try:
+            return await self._request("GET", url, operation, timeout, **kwargs)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self.ip, setting)
+
+    async def query_post(
+        self,
+        setting=None,
+        params=None,
+        files=None,
+        timeout=5,
+        verify=False,
+    ):
+        url = self.get_url(setting=setting)
+        LOGGER.debug("Запрос:{host},{params},{files}".format(
+            host=url,
+            params=params,
+            files=files,
+        ))
+        operation = get_operation_type("POST", setting, params, files)
+        kwargs = {}
+
+        if params:
+            kwargs["params"] = params
+
+        if files:
+            form = aiohttp.FormData()
+            for name, value in files.items():
+                if isinstance(value, tuple):
+                    filename, value = value[0], value[1]
+                else:
+                    filename = getattr(value, "name", name)
+                form.add_field(name, value, filename=str(filename))
+            kwargs["data"] = form
+
+        try:
+            return await self._request("POST", url, operation, timeout, **kwargs)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self.ip, setting)
+
+    async def check_credentials(self):
+        """Проверка корректности логина и пароля."""
+        responce = await self.query()
+        if responce.status_code == 200:
+            return True
+        return False
+
+    async def close(self):
+        LOGGER.debug("Асинхронная сессия закрыта.")
+        if self.session is not None and self._own_session:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncBewardClient(AsyncClient):
+    """Асинхронный клиент для взаимодействия с домофонными панелями Beward."""
+
+    parse_response = BewardClient.parse_response
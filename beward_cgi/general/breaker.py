@@ -0,0 +1,197 @@
+#!/usr/bin/python
+# coding=utf8
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+
+LOGGER = getLogger(__name__)
+
+"""Автоматический выключатель и политики повторов запросов к панелям.
+"""
+
+READ_ACTIONS = frozenset(("get", "list", "export", "regstatus"))
+UPLOAD_ACTIONS = frozenset(("import", "upgrade"))
+# cgi без action, повторный вызов которых меняет состояние панели
+NON_IDEMPOTENT_CGI = frozenset((
+    "cgi-bin/restart_cgi",
+    "cgi-bin/factorydefault_cgi",
+    "cgi-bin/hardfactorydefault_cgi",
+))
+
+
+class CircuitOpenError(ConnectionError):
+    """Выключатель панели разомкнут, запрос не отправлялся."""
+
+
+def is_connect_error(err):
+    """Ошибка возникла до отправки запроса на панель."""
+    if isinstance(err, ConnectTimeout):
+        return True
+    if isinstance(err, ConnectionError) and err.args:
+        reason = getattr(err.args[0], "reason", err.args[0])
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def get_operation_type(method="GET", setting=None, params=None, files=None):
+    """Тип операции для выбора политики повторов.
+
+    Returns:
+        str: "read" - идемпотентное чтение, "write" - изменение параметров,
+        "upload" - загрузка файлов на панель.
+    """
+    action = (params or {}).get("action")
+    if files or action in UPLOAD_ACTIONS:
+        return "upload"
+    if action in READ_ACTIONS:
+        return "read"
+    if action is None and method == "GET" and setting not in NON_IDEMPOTENT_CGI:
+        return "read"
+    return "write"
+
+
+class RetryPolicy(object):
+    """Бюджет повторов для одного типа операций.
+
+    Attributes:
+        total: количество повторов после первой попытки.
+        backoff_factor: базовая задержка, растет как backoff_factor * 2 ** n.
+        retry_read_errors: повторять ли ошибки после отправки запроса.
+            Для неидемпотентных операций повторяются только ошибки
+            подключения, когда панель запрос не получила.
+    """
+
+    def __init__(self, total=3, backoff_factor=0.5, retry_read_errors=True):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.retry_read_errors = retry_read_errors
+
+    def __repr__(self):
+        return "RetryPolicy(total={}, backoff_factor={}, retry_read_errors={})".format(
+            self.total,
+            self.backoff_factor,
+            self.retry_read_errors,
+        )
+
+    def is_retryable(self, err):
+        if is_connect_error(err):
+            return True
+        return self.retry_read_errors and isinstance(err, (ConnectionError, Timeout))
+
+    def get_backoff(self, attempt):
+        return self.backoff_factor * (2 ** attempt)
+
+
+RETRY_POLICIES = {
+    "read": RetryPolicy(total=3, backoff_factor=0.5, retry_read_errors=True),
+    "write": RetryPolicy(total=2, backoff_factor=0.5, retry_read_errors=False),
+    "upload": RetryPolicy(total=0, backoff_factor=0, retry_read_errors=False),
+}
+
+
+class CircuitBreaker(object):
+    """Выключатель запросов к одной панели.
+
+    После failure_threshold ошибок подряд выключатель размыкается и запросы
+    сразу завершаются CircuitOpenError. Через recovery_timeout секунд
+    пропускается один пробный вызов: успех замыкает выключатель, ошибка
+    снова размыкает его. Если вызов завершился ошибкой, не связанной с
+    панелью, пробный вызов освобождается через release_trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host=None, failure_threshold=5, recovery_timeout=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return self.CLOSED
+        if now - self._opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        """Проверка перед запросом.
+
+        Raises:
+            CircuitOpenError: выключатель разомкнут.
+        """
+        with self._lock:
+            state = self._state(monotonic())
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(
+            "Circuit for {} is open after {} failures.".format(self.host, self.failures),
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    LOGGER.warning("Выключатель {} разомкнут.".format(self.host))
+                self._opened_at = monotonic()
+            self._trial = False
+
+    def release_trial(self):
+        """Освободить пробную попытку без учета результата."""
+        with self._lock:
+            self._trial = False
+
+    def reset(self):
+        self.record_success()
+
+
+class CircuitBreakerRegistry(object):
+    """Выключатели по адресу панели, общие для всех модулей процесса."""
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers = {}
+        self._lock = Lock()
+
+    def get(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    host,
+                    self.failure_threshold,
+                    self.recovery_timeout,
+                )
+                self._breakers[host] = breaker
+            return breaker
+
+    def clear(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+BREAKERS = CircuitBreakerRegistry()
@@ -0,0 +1,180 @@
+#!/usr/bin/python
+# coding=utf8
+from collections import OrderedDict
+from hashlib import sha256
+from logging import getLogger
+from threading import Event, Lock
+from time import monotonic
+
+LOGGER = getLogger(__name__)
+
+"""Кэш ответов панелей на запросы чтения и объединение одинаковых запросов.
+"""
+
+CACHED_ACTIONS = frozenset(("get", "list", "export"))
+# Запросы, которые можно объединять: небольшие ответы без побочных эффектов
+COALESCED_ACTIONS = frozenset(("get", "list"))
+
+
+def make_auth_key(login, password):
+    """Учетные данные для ключа запроса: логин и хэш пароля."""
+    if password is None:
+        return login, None
+    return login, sha256(str(password).encode("utf-8")).hexdigest()
+
+
+def make_cache_key(ip, setting, params, auth=None):
+    """Ключ запроса: адрес панели, cgi, параметры без учета порядка и
+    учетные данные из make_auth_key.
+
+    Ответ панели зависит от учетных данных, поэтому клиенты с другим
+    логином или паролем не получают чужой ответ из общего кэша.
+    """
+    return (ip, setting, tuple(sorted((params or {}).items())), auth)
+
+
+class ResponseCache(object):
+    """LRU кэш ответов с временем жизни записей.
+
+    Кэшируются только успешные ответы на action=get/list/export. Любой
+    изменяющий запрос к cgi панели удаляет записи этого cgi.
+    """
+
+    def __init__(self, ttl=30.0, maxsize=1024):
+        """Инициализация кэша.
+
+        Args:
+            ttl (float): время жизни записи в секундах.
+            maxsize (int): максимальное количество записей.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def is_cacheable(params):
+        return bool(params) and params.get("action") in CACHED_ACTIONS
+
+    def get(self, key):
+        """Получить ответ из кэша.
+
+        Returns:
+            Response или None, если записи нет или она устарела.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, response = entry
+            if expires < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key, response):
+        """Сохранить ответ в кэше."""
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ip, setting=None):
+        """Удалить записи панели.
+
+        Args:
+            ip (str): адрес панели.
+            setting (str, optional): cgi. Если не указан, удаляются все
+                записи панели.
+        """
+        with self._lock:
+            expired = [
+                key
+                for key in self._entries
+                if key[0] == ip and (setting is None or key[1] == setting)
+            ]
+            for key in expired:
+                del self._entries[key]
+        if expired:
+            LOGGER.debug("Кэш {} {} сброшен.".format(ip, setting))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+class _Call(object):
+    """Выполняемый запрос и его результат."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Объединение одинаковых одновременных запросов.
+
+    Пока запрос с ключом выполняется, остальные потоки с тем же ключом
+    не отправляют свой запрос, а ждут и получают тот же ответ или ту же
+    ошибку. Объединяются только запросы action=get/list.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    @staticmethod
+    def is_coalescable(params):
+        return bool(params) and params.get("action") in COALESCED_ACTIONS
+
+    def do(self, key, func):
+        """Выполнить func один раз для всех одновременных вызовов с key.
+
+        Args:
+            key (hashable): ключ запроса.
+            func (callable): выполнение запроса.
+
+        Returns:
+            Результат func.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            LOGGER.debug("Ожидание выполняемого запроса {}.".format(key))
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+IN_FLIGHT = SingleFlight()
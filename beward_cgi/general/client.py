@@ -1,11 +1,17 @@
 #!/usr/bin/python
 # coding=utf8
+from codecs import getincrementaldecoder
 from collections import OrderedDict
 from logging import getLogger
+from time import sleep
+from weakref import finalize
 
 import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+
+from .breaker import BREAKERS, RETRY_POLICIES, get_operation_type
+from .cache import make_auth_key, make_cache_key
+from .multipart import MultipartPayload
 
 LOGGER = getLogger(__name__)
 
@@ -13,20 +19,58 @@ LOGGER = getLogger(__name__)
 class Client(object):
     """Класс для работы с запросами к оборудованию."""
 
-    def __init__(self, ip=None, login=None, password=None):
-        """Инициаизация клиента для связис панелью."""
+    def __init__(
+        self,
+        ip=None,
+        login=None,
+        password=None,
+        pool=None,
+        breaker=None,
+        retry_policies=None,
+        cache=None,
+        flights=None,
+    ):
+        """Инициаизация клиента для связис панелью.
+
+        Args:
+            pool (SessionPool, optional): реестр общих сессий. Если не передан,
+                клиент создает собственную сессию.
+            breaker (CircuitBreaker, optional): выключатель панели. По умолчанию
+                общий для всех клиентов этого адреса из BREAKERS.
+            retry_policies (dict, optional): политики повторов по типам
+                операций "read", "write", "upload". По умолчанию RETRY_POLICIES.
+            cache (ResponseCache, optional): кэш ответов action=get/list/export.
+                По умолчанию запросы не кэшируются.
+            flights (SingleFlight, optional): объединение одинаковых
+                одновременных запросов action=get/list, например общее
+                IN_FLIGHT. По умолчанию запросы не объединяются.
+        """
 
         LOGGER.debug("Инициализация экземпляра класса клиента")
         self.ip = ip
         self.login = login
         self.password = password
-        self.session = self.create_session()
+        self.auth = (login, password)
+        self.auth_key = make_auth_key(login, password)
+        self.pool = pool
+        self.breaker = breaker if breaker is not None else BREAKERS.get(ip)
+        self.retry_policies = dict(RETRY_POLICIES)
+        self.retry_policies.update(retry_policies or {})
+        self.cache = cache
+        self.flights = flights
 
-    def create_session(self):
+        if pool is None:
+            self.session = self.create_session()
+            self._release = self.session.close
+        else:
+            self.session = pool.acquire(ip, login, self.create_session)
+            self._release = finalize(self, pool.release, ip, login)
+
+    def create_session(self, pool_maxsize=DEFAULT_POOLSIZE):
         LOGGER.debug("Создание сессии с  ip: {}.".format(self.ip))
         s = requests.Session()
-        retry = Retry(total=5, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
+        # Повторы выполняет _request по политике операции
+        adapter = HTTPAdapter(max_retries=0, pool_maxsize=pool_maxsize)
         s.mount("http://", adapter)
         s.mount("https://", adapter)
         s.auth = (self.login, self.password)
@@ -49,15 +93,135 @@ class Client(object):
         LOGGER.debug("Ссылка создана: {}".format(url))
         return url
 
-    def query(self, setting=None, params=None, timeout=5, verify=False):
+    def _request(self, method, url, operation, **kwargs):
+        """Выполнение запроса через выключатель панели с повторами.
+
+        Выключатель проверяется один раз на вызов и получает одну ошибку
+        после исчерпания повторов, а не по ошибке на каждую попытку.
+
+        Args:
+            method (str): HTTP метод.
+            url (str): ссылка.
+            operation (str): тип операции для выбора политики повторов.
+
+        Raises:
+            CircuitOpenError: панель недавно не отвечала, запрос не отправлен.
+        """
+        policy = self.retry_policies[operation]
+        attempt = 0
+        payload = kwargs.get("data")
+
+        self.breaker.before_call()
+        recorded = False
+        try:
+            while True:
+                try:
+                    # Потоковое тело генерируется заново для каждой попытки
+                    if isinstance(payload, MultipartPayload):
+                        kwargs["data"] = payload.body()
+                    response = self.session.request(method, url, auth=self.auth, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as err:
+                    if attempt >= policy.total or not policy.is_retryable(err):
+                        recorded = True
+                        self.breaker.record_failure()
+                        raise
+                    delay = policy.get_backoff(attempt)
+                    attempt += 1
+                    LOGGER.debug(
+                        "Повтор {} запроса {} через {} с: {}".format(
+                            operation,
+                            url,
+                            delay,
+                            err,
+                        ),
+                    )
+                    sleep(delay)
+                    continue
+                except requests.RequestException:
+                    recorded = True
+                    self.breaker.record_failure()
+                    raise
+                recorded = True
+                self.breaker.record_success()
+                return response
+        finally:
+            # Ошибка не в работе панели, например при генерации тела запроса
+            if not recorded:
+                self.breaker.release_trial()
+
+    def query(self, setting=None, params=None, timeout=5, verify=False, stream=False):
+        """GET запрос к панели.
+
+        Args:
+            stream (bool): не читать тело ответа сразу, например для
+                iter_content. Такой ответ не кэшируется и не объединяется
+                с одинаковыми запросами, его нужно закрыть после чтения.
+        """
         url = self.get_url(setting=setting)
         LOGGER.debug("Запрос:{host}.".format(host=url))
+        operation = get_operation_type("GET", setting, params)
 
         if params:
             LOGGER.debug("Param load: {}".format(params))
-            return self.session.get(url, timeout=timeout, params=params, verify=verify)
 
-        return self.session.get(url, timeout=timeout)
+        if operation == "read" and stream:
+            return self._request(
+                "GET",
+                url,
+                operation,
+                timeout=timeout,
+                params=params,
+                verify=verify,
+                stream=True,
+            )
+        if operation == "read":
+            return self._read_query(setting, url, params, timeout, verify)
+
+        try:
+            return self._request(
+                "GET",
+                url,
+                operation,
+                timeout=timeout,
+                params=params,
+                verify=verify,
+            )
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self.ip, setting)
+
+    def _read_query(self, setting, url, params, timeout, verify):
+        """Запрос чтения через кэш ответов и объединение запросов.
+
+        Если задан flights, одинаковые одновременные запросы action=get/list
+        с теми же учетными данными выполняются одним HTTP запросом, все
+        вызовы получают один объект ответа.
+        """
+        key = make_cache_key(self.ip, setting, params, self.auth_key)
+        cacheable = self.cache is not None and self.cache.is_cacheable(params)
+        if cacheable:
+            response = self.cache.get(key)
+            if response is not None:
+                LOGGER.debug("Ответ из кэша: {} {}".format(url, params))
+                return response
+
+        def _get():
+            return self._request(
+                "GET",
+                url,
+                "read",
+                timeout=timeout,
+                params=params,
+                verify=verify,
+            )
+
+        if self.flights is not None and self.flights.is_coalescable(params):
+            response = self.flights.do(key, _get)
+        else:
+            response = _get()
+        if cacheable and response.status_code == 200:
+            self.cache.set(key, response)
+        return response
 
     def query_post(
         self,
@@ -66,11 +230,50 @@ class Client(object):
         files=None,
         timeout=5,
         verify=False,
+        data=None,
+        headers=None,
     ):
+        """POST запрос к панели.
+
+        Args:
+            files (dict, optional): файлы формы, тело собирается в памяти.
+            data (Union[MultipartPayload, bytes, Iterable[bytes]], optional):
+                готовое тело запроса, например потоковое MultipartPayload.
+            headers (dict, optional): заголовки запроса, для MultipartPayload
+                по умолчанию payload.headers.
+        """
+        try:
+            return self._query_post(setting, params, files, timeout, verify, data, headers)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self.ip, setting)
+
+    def _query_post(self, setting, params, files, timeout, verify, data=None, headers=None):
         url = self.get_url(setting=setting)
         LOGGER.debug("Запрос:{host}.".format(host=url))
+        operation = get_operation_type("POST", setting, params, files or data is not None)
 
-        if files:
+        if data is not None:
+            if headers is None and isinstance(data, MultipartPayload):
+                headers = data.headers
+            LOGGER.debug(
+                "Запрос:{host},{params},{data}".format(
+                    host=url,
+                    params=params,
+                    data=data,
+                ),
+            )
+            return self._request(
+                "POST",
+                url,
+                operation,
+                timeout=timeout,
+                data=data,
+                headers=headers,
+                params=params,
+                verify=verify,
+            )
+        elif files:
             LOGGER.debug(
                 "Запрос:{host},{params},{files}".format(
                     host=url,
@@ -78,8 +281,10 @@ class Client(object):
                     files=files,
                 ),
             )
-            return self.session.post(
+            return self._request(
+                "POST",
                 url,
+                operation,
                 timeout=timeout,
                 files=files,
                 params=params,
@@ -93,9 +298,16 @@ class Client(object):
                     files=files,
                 ),
             )
-            return self.session.post(url, timeout=timeout, params=params, verify=verify)
+            return self._request(
+                "POST",
+                url,
+                operation,
+                timeout=timeout,
+                params=params,
+                verify=verify,
+            )
 
-        return self.session.post(url, timeout=timeout)
+        return self._request("POST", url, operation, timeout=timeout, verify=verify)
 
     def check_credentials(self):
         """Проверка корректности логина и пароля."""
@@ -106,38 +318,110 @@ class Client(object):
 
     def close(self):
         LOGGER.debug("Сессия закрыта.")
-        return self.session.close()
+        return self._release()
+
+
+def iter_body_lines(chunks, encoding="UTF-8"):
+    """Разбиение потока байтов ответа на строки по символу перевода строки.
+
+    Args:
+        chunks (Iterable[bytes]): части тела ответа, например iter_content.
+        encoding (str): кодировка ответа.
+
+    Yields:
+        str: строка без переводов строки и символов "\\r".
+    """
+    decoder = getincrementaldecoder(encoding)()
+    tail = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text = decoder.decode(chunk)
+        if "\r" in text:
+            text = text.replace("\r", "")
+        lines = (tail + text).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def parse_lines(lines):
+    """Однопроходный разбор строк ответа Beward.
+
+    Строка key=value разделяется по первому "=", поэтому значения с "="
+    сохраняются целиком. Строки без "=" сохраняются как message_N, где N -
+    номер строки среди непустых. Если ответ состоит из одной такой строки,
+    она сохраняется как message.
+
+    Args:
+        lines (Iterable[str]): строки тела ответа без символов "\\r".
+
+    Returns:
+        OrderedDict: разобранный ответ, всегда содержит ключ message.
+    """
+    parse_content = OrderedDict()
+    number = 0
+    first_message = None
+
+    for line in lines:
+        if not line:
+            continue
+
+        key, separator, value = line.partition("=")
+        if separator:
+            parse_content[key] = value
+        else:
+            if number == 0:
+                first_message = key
+            parse_content["message_%d" % number] = key
+        number += 1
+
+    if number == 1 and first_message is not None:
+        parse_content = OrderedDict(message=first_message)
+    elif "message" not in parse_content:
+        parse_content["message"] = ""
+
+    return parse_content
 
 
 class BewardClient(Client):
     """Клиент для взаимодействия с домофонными панелями Beward."""
 
-    def parse_response(self, response):
-        """Парсинг ответа от домофна Beward."""
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def parse_response(self, response, stream=False):
+        """Парсинг ответа от домофна Beward.
 
-        content = response.content.decode("UTF-8").replace("\r", "").split("\n")
-        content = [line for line in content if line]
-        parse_content = OrderedDict()
+        Результат разбора сохраняется в ответе, поэтому общий ответ из кэша
+        или объединенного запроса разбирается один раз. Каждый вызов получает
+        свою копию содержимого.
 
-        for number, line in enumerate(content):
-            try:
-                line = str(line).split("=")
-            except UnicodeEncodeError:
-                line = line.split("=")
+        Args:
+            response: ответ панели.
+            stream (bool): читать тело частями через iter_content, не
+                загружая его целиком. Ответ должен быть получен с stream=True.
+        """
 
-            if len(line) == 2:
-                parse_content[line[0]] = line[1]
-            elif len(line) == 1 and len(content) == 1:
-                parse_content["message"] = line[0]
-            elif len(line) == 1:
-                parse_content["message_{}".format(number)] = line[0]
-            else:
-                parse_content["message_{}".format(number)] = ";".join(line)
+        if stream:
+            return {
+                "code": response.status_code,
+                "content": parse_lines(
+                    iter_body_lines(response.iter_content(self.STREAM_CHUNK_SIZE)),
+                ),
+            }
 
-        if "message" not in parse_content:
-            parse_content["message"] = ""
+        content = getattr(response, "_parsed_content", None)
+        if content is None:
+            text = response.content.decode("UTF-8")
+            if "\r" in text:
+                text = text.replace("\r", "")
+            content = parse_lines(text.split("\n"))
+            response._parsed_content = content
 
         return {
             "code": response.status_code,
-            "content": parse_content,
+            "content": OrderedDict(content),
         }
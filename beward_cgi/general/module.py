@@ -1,35 +1,86 @@
 #!/usr/bin/python
 # coding=utf8
+from copy import deepcopy
 from logging import getLogger
+from threading import Lock
 
 from .client import BewardClient
 from .dump_creator import JSONDumpFormatter, make_dumps
+from .params import ParamAttributesMixin, ParamStore
+from .pool import SESSION_POOL
 
 LOGGER = getLogger(__name__)
 
+# Поколения параметров панелей: (адрес, cgi) или (адрес, None) для всех cgi
+_GENERATIONS = {}
+_GENERATIONS_LOCK = Lock()
+
+
+def get_params_generation(ip, cgi):
+    """Поколение параметров cgi панели, меняется при их сбросе."""
+    with _GENERATIONS_LOCK:
+        return _GENERATIONS.get((ip, None), 0), _GENERATIONS.get((ip, cgi), 0)
+
+
+def invalidate_loaded_params(ip, cgis=None):
+    """Сбросить загруженные параметры cgi панели во всех модулях процесса.
+
+    Следующий set_params модулей этих cgi отправит все параметры.
+
+    Args:
+        ip (str): адрес панели.
+        cgis (Iterable[str], optional): cgi панели. По умолчанию все.
+    """
+    with _GENERATIONS_LOCK:
+        for cgi in (None,) if cgis is None else cgis:
+            _GENERATIONS[(ip, cgi)] = _GENERATIONS.get((ip, cgi), 0) + 1
+
 
 class BewardIntercomModuleError(Exception):
     pass
 
 
-class BewardIntercomModule(object):
+class BewardIntercomModule(ParamAttributesMixin):
     """Модуль описывающий архитектуру любого модуля для взаимодействия
     с cgi api.
+
+    После load_params модуль запоминает параметры панели, и set_params
+    отправляет только измененные параметры. Если изменений нет, запрос
+    не выполняется. Запись параметров, которая меняет настройки других
+    cgi панели, сбрасывает их загруженные параметры через invalidates.
+
+    Параметры хранятся в self.params, атрибуты param_<имя> читают и
+    записывают соответствующий параметр.
     """
 
+    # Отправлять в set_params только измененные параметры
+    diff_set_params = True
+    # cgi, настройки которых меняет set_params этого модуля
+    invalidates = ()
+
     def __init__(self, client=None, ip=None, login=None, password=None, cgi=""):
         """Инициализация параметров модуля."""
 
+        # Подкласс мог записать param_ атрибуты до вызова __init__
+        if "params" not in self.__dict__:
+            self.params = ParamStore()
         if client is None:
             if login is None or password is None:
                 raise BewardIntercomModuleError("Invalid credentials.")
             self.login = login
             self.password = password
-            self.client = BewardClient(ip, self.login, self.password)
+            self.client = BewardClient(
+                ip,
+                self.login,
+                self.password,
+                pool=SESSION_POOL,
+            )
         else:
             self.client = client
 
         self.cgi = cgi
+        self._loaded_params = None
+        self._loaded_generation = None
 
     def __str__(self):
         """Название модуля."""
@@ -39,8 +90,20 @@ class BewardIntercomModule(object):
         """Метод получения параметров установленных на панели."""
 
         response = self.client.query(setting=self.cgi, params={"action": "get"})
+        self._load_response(self.client.parse_response(response))
+
+    async def async_load_params(self):
+        """Асинхронный вариант load_params поверх AsyncBewardClient."""
+
+        response = await self.client.query(setting=self.cgi, params={"action": "get"})
+        self._load_response(self.client.parse_response(response))
+
+    def _load_response(self, response):
+        """Разбор ответа action=get в параметры модуля.
 
-        response = self.client.parse_response(response)
+        Args:
+            response (dict): ответ после parse_response.
+        """
         content = response.get("content", {})
 
         if response.get("code") != 200:
@@ -57,9 +120,52 @@ class BewardIntercomModule(object):
                 continue
 
             try:
-                self.__dict__["param_" + str(key)] = str(value)
+                self.params[str(key)] = str(value)
             except UnicodeEncodeError:
-                self.__dict__["param_" + str(key)] = value
+                self.params[str(key)] = value
+
+        self._mark_loaded()
+
+    def _mark_loaded(self, params=None):
+        """Запомнить параметры, установленные на панели.
+
+        Args:
+            params (dict, optional): параметры панели. По умолчанию get_params.
+        """
+        self._loaded_params = deepcopy(self.get_params() if params is None else params)
+        self._loaded_generation = get_params_generation(self.client.ip, self.cgi)
+
+    def get_changed_params(self, params=None):
+        """Параметры, измененные после загрузки с панели.
+
+        Args:
+            params (dict, optional): текущие параметры. По умолчанию get_params.
+
+        Returns:
+            dict: измененные параметры. Если параметры не загружались с
+            панели, были сброшены после загрузки или diff_set_params
+            выключен, возвращаются все параметры.
+        """
+        if params is None:
+            params = self.get_params()
+        loaded = self._loaded_params
+        if loaded is None or not self.diff_set_params:
+            return params
+        if self._loaded_generation != get_params_generation(self.client.ip, self.cgi):
+            return params
+        return {
+            key: value
+            for key, value in params.items()
+            if key not in loaded or loaded[key] != value
+        }
+
+    def reset_loaded_params(self):
+        """Забыть загруженные параметры.
+
+        Следующий set_params отправит все параметры, например когда
+        настройки на панели изменились в обход модуля.
+        """
+        self._loaded_params = None
 
     def update_params(self, update=None, *args, **kwargs):
         """Обновление параметров модуля.
@@ -73,38 +179,48 @@ class BewardIntercomModule(object):
 
         if update is None:
             update = {}
-        for key, value in update.items():
-            item = self.__dict__.get("param_" + key, None)
-
-            if item is None:
-                continue
-
-            self.__dict__["param_" + key] = value
+        self.params.update_existing(update)
 
         return True
 
     def set_params(self):
         """Метод загрузки параметров на панель панели."""
 
-        params = self.get_params()
+        params = self.get_changed_params()
+        if not params:
+            LOGGER.debug("{}: параметры не изменились.".format(self))
+            return True
         params["action"] = "set"
         response = self.client.query(setting=self.cgi, params=params)
+        return self._set_response(response)
+
+    async def async_set_params(self):
+        """Асинхронный вариант set_params поверх AsyncBewardClient."""
+
+        params = self.get_changed_params()
+        if not params:
+            LOGGER.debug("{}: параметры не изменились.".format(self))
+            return True
+        params["action"] = "set"
+        response = await self.client.query(setting=self.cgi, params=params)
+        return self._set_response(response)
+
+    def _set_response(self, response):
+        """Проверка ответа action=set."""
 
         if response.status_code != 200:
             raise BewardIntercomModuleError("Error, %s" % response.status_code)
 
         LOGGER.debug("", response)
+        if self.invalidates:
+            invalidate_loaded_params(self.client.ip, self.invalidates)
+        if self._loaded_params is not None:
+            self._mark_loaded()
         return True
 
     def get_params(self):
         """Получить параметры с панели."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if "param_" == key[:6]:
-                key = key.replace("param_", "")
-                params.update({key: value})
-
-        return params
+        return dict(self.params)
 
     def get_dump(self, formatter=JSONDumpFormatter, raw=False):
         """Сохранение параметров модуля.
@@ -128,11 +244,7 @@ class BewardIntercomModule(object):
         if module_config is None:
             raise BewardIntercomModuleError("Module config not found.")
 
-        for key, value in module_config.items():
-            check_param = self.__dict__.get("param_" + key, None)
-            if check_param is None:
-                LOGGER.error("Param %s not found.", key)
-                continue
-            self.__dict__["param_" + key] = value
-            LOGGER.debug("Param %s set to %s.", key, value)
+        for key in self.params.update_existing(module_config):
+            LOGGER.error("Param %s not found.", key)
+        LOGGER.debug("Params set to %s.", module_config)
         return True
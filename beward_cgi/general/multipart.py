@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# coding=utf8
+from uuid import uuid4
+
+"""Потоковое тело multipart/form-data для загрузки файлов на панель.
+"""
+
+
+class MultipartPayload(object):
+    """Тело multipart/form-data с одним файлом из строк.
+
+    Строки файла генерируются лениво при каждой отправке и собираются в
+    куски по chunk_size байт, поэтому память не зависит от размера файла.
+    Граница, заголовки и длина тела вычисляются один раз, и один объект
+    можно отправлять на несколько панелей.
+
+    По умолчанию тело отправляется с Content-Length: длина считается
+    отдельным проходом по строкам при первой отправке. С chunked=True
+    длина не считается и тело отправляется с Transfer-Encoding: chunked.
+
+    Пример:
+        payload = MultipartPayload(
+            "file",
+            "keys.csv",
+            lambda: (key.get_key_string() for key in keys),
+        )
+        client.query_post(setting=cgi, params=params, data=payload)
+    """
+
+    def __init__(
+        self,
+        field,
+        filename,
+        lines,
+        content_type=None,
+        chunk_size=65536,
+        chunked=False,
+    ):
+        """Инициализация тела запроса.
+
+        Args:
+            field (str): имя поля формы.
+            filename (str): имя файла.
+            lines (Union[Callable[[], Iterable[str]], Iterable[str]]): строки
+                файла без перевода строки. Функция, возвращающая новый
+                генератор строк, или коллекция, которую можно обойти
+                несколько раз.
+            content_type (str, optional): тип содержимого файла.
+            chunk_size (int): размер отправляемого куска в байтах.
+            chunked (bool): отправлять без Content-Length.
+
+        Raises:
+            TypeError: если lines - одноразовый итератор.
+        """
+        if not callable(lines) and iter(lines) is lines:
+            raise TypeError("lines must be callable or re-iterable.")
+        self.lines = lines
+        self.chunk_size = chunk_size
+        self.chunked = chunked
+        self.boundary = uuid4().hex
+        head = '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'.format(
+            self.boundary,
+            field,
+            filename,
+        )
+        if content_type:
+            head += "Content-Type: {}\r\n".format(content_type)
+        self.head = (head + "\r\n").encode("utf-8")
+        self.tail = "\r\n--{}--\r\n".format(self.boundary).encode("utf-8")
+        self._length = None
+
+    @property
+    def headers(self):
+        return {"Content-Type": "multipart/form-data; boundary=" + self.boundary}
+
+    def __repr__(self):
+        return "MultipartPayload({})".format(self.boundary)
+
+    def __len__(self):
+        """Длина тела в байтах."""
+        if self._length is None:
+            self._length = len(self.head) + len(self.tail) + sum(
+                len(line.encode("utf-8")) + 1 for line in self._iter_lines()
+            )
+        return self._length
+
+    def __iter__(self):
+        """Куски тела запроса, каждый обход генерирует строки заново."""
+        yield self.head
+        chunk = []
+        size = 0
+        for line in self._iter_lines():
+            line = (line + "\n").encode("utf-8")
+            chunk.append(line)
+            size += len(line)
+            if size >= self.chunk_size:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b"".join(chunk)
+        yield self.tail
+
+    def _iter_lines(self):
+        return self.lines() if callable(self.lines) else iter(self.lines)
+
+    def body(self):
+        """Тело для requests.
+
+        Returns:
+            MultipartPayload или генератор кусков для отправки без
+            Content-Length.
+        """
+        if self.chunked:
+            return iter(self)
+        return self
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# coding=utf8
+
+"""Хранилище параметров модулей, ключей и прав.
+"""
+
+
+class ParamStore(dict):
+    """Параметры в порядке добавления с доступом по имени за O(1)."""
+
+    __slots__ = ()
+
+    def update_existing(self, update):
+        """Обновить только существующие параметры.
+
+        Args:
+            update (dict): новые значения параметров.
+
+        Returns:
+            list: имена параметров, которых нет в хранилище.
+        """
+        missing = []
+        for key, value in update.items():
+            if key in self:
+                self[key] = value
+            else:
+                missing.append(key)
+        return missing
+
+
+class ParamAttributesMixin(object):
+    """Доступ к хранилищам параметров через атрибуты с префиксом.
+
+    ATTRIBUTE_STORES сопоставляет префикс атрибута и имя хранилища, например
+    module.param_Enable читает и записывает module.params["Enable"]. Так
+    сохраняется прежний доступ к параметрам, которые раньше лежали в __dict__.
+    Имя хранилища не может начинаться с префикса, иначе присваивание
+    хранилища попадет в него же.
+    """
+
+    ATTRIBUTE_STORES = (("param_", "params"),)
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(ParamAttributesMixin, cls).__init_subclass__(**kwargs)
+        for _, store_name in cls.ATTRIBUTE_STORES:
+            for prefix, _ in cls.ATTRIBUTE_STORES:
+                if store_name.startswith(prefix):
+                    raise TypeError(
+                        "Store '{}' of {} starts with attribute prefix '{}'".format(
+                            store_name,
+                            cls.__name__,
+                            prefix,
+                        ),
+                    )
+
+    def _find_store(self, name):
+        for prefix, store_name in self.ATTRIBUTE_STORES:
+            if name.startswith(prefix):
+                try:
+                    store = object.__getattribute__(self, store_name)
+                except AttributeError:
+                    store = ParamStore()
+                    object.__setattr__(self, store_name, store)
+                return store, name[len(prefix):]
+        return None, None
+
+    def __getattr__(self, name):
+        store, key = self._find_store(name)
+        if store is not None and key in store:
+            return store[key]
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name),
+        )
+
+    def __setattr__(self, name, value):
+        store, key = self._find_store(name)
+        if store is None:
+            object.__setattr__(self, name, value)
+        else:
+            store[key] = value
+
+    def __delattr__(self, name):
+        store, key = self._find_store(name)
+        if store is None:
+            object.__delattr__(self, name)
+        elif key in store:
+            del store[key]
+        else:
+            raise AttributeError(name)
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# coding=utf8
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+LOGGER = getLogger(__name__)
+
+"""Процессный реестр keep-alive сессий к панелям.
+"""
+
+
+class _PoolEntry(object):
+    """Сессия в реестре и счетчик клиентов, которые ее используют."""
+
+    __slots__ = ("session", "refcount", "last_used")
+
+    def __init__(self, session):
+        self.session = session
+        self.refcount = 0
+        self.last_used = monotonic()
+
+
+class SessionPool(object):
+    """Реестр сессий requests с ключом (ip, login).
+
+    Все клиенты одной панели получают одну сессию, поэтому модули и проверка
+    учетных данных переиспользуют уже открытые соединения. Сессии, которые
+    никто не использует дольше idle_timeout секунд, закрываются.
+    """
+
+    def __init__(self, pool_maxsize=10, idle_timeout=60.0):
+        """Инициализация реестра.
+
+        Args:
+            pool_maxsize (int): количество соединений к одной панели.
+            idle_timeout (float): время простоя сессии до закрытия в секундах.
+        """
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self._lock = Lock()
+        self._last_sweep = monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def configure(self, pool_maxsize=None, idle_timeout=None):
+        """Изменение параметров реестра для новых сессий.
+
+        Args:
+            pool_maxsize (int, optional): количество соединений к одной панели.
+            idle_timeout (float, optional): время простоя сессии в секундах.
+        """
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+
+    def acquire(self, ip, login, factory):
+        """Получить сессию для панели.
+
+        Args:
+            ip (str): адрес панели.
+            login (str): имя пользователя.
+            factory (callable): создание сессии, принимает pool_maxsize.
+
+        Returns:
+            requests.Session: общая сессия.
+        """
+        key = (ip, login)
+        now = monotonic()
+        with self._lock:
+            if now - self._last_sweep > self.idle_timeout / 2:
+                self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                LOGGER.debug("Новая сессия в реестре для {}.".format(key))
+                entry = _PoolEntry(factory(pool_maxsize=self.pool_maxsize))
+                self._entries[key] = entry
+            entry.refcount += 1
+            entry.last_used = now
+            return entry.session
+
+    def release(self, ip, login):
+        """Вернуть сессию в реестр.
+
+        Args:
+            ip (str): адрес панели.
+            login (str): имя пользователя.
+        """
+        with self._lock:
+            entry = self._entries.get((ip, login))
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = monotonic()
+
+    def evict_idle(self):
+        """Закрыть неиспользуемые сессии.
+
+        Returns:
+            int: количество закрытых сессий.
+        """
+        with self._lock:
+            return self._evict(monotonic())
+
+    def _evict(self, now):
+        self._last_sweep = now
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry.refcount == 0 and now - entry.last_used > self.idle_timeout
+        ]
+        for key in expired:
+            LOGGER.debug("Сессия {} закрыта по простою.".format(key))
+            self._entries.pop(key).session.close()
+        return len(expired)
+
+    def close(self):
+        """Закрыть все сессии реестра."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.session.close()
+            self._entries.clear()
+
+
+SESSION_POOL = SessionPool()
@@ -8,7 +8,13 @@ LOGGER = getLogger(__name__)
 
 
 class HttpsModule(BewardIntercomModule):
-    """Модуль взаимодействия с cgi https_cgi"""
+    """Модуль взаимодействия с cgi https_cgi
+
+    Параметры сертификата хранятся в self.certificate, атрибуты
+    cert_<имя> читают и записывают соответствующий параметр.
+    """
+
+    ATTRIBUTE_STORES = (("param_", "params"), ("cert_", "certificate"))
 
     def __init__(
         self,
@@ -68,13 +74,7 @@ class HttpsModule(BewardIntercomModule):
 
     def get_cert_params(self):
         """Получить параметры сертификата."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if "cert_" == key[:5]:
-                key = key.replace("cert_", "")
-                params.update({key: value})
-
-        return params
+        return dict(self.certificate)
 
     def create_cert(self):
         """Создать сертификат HTTPS."""
@@ -93,12 +93,6 @@ class HttpsModule(BewardIntercomModule):
         """Обновить параметры сертификата."""
         if update is None:
             update = {}
-        for key, value in update.items():
-            item = self.__dict__.get("cert_" + key, None)
-
-            if item is None:
-                continue
-
-            self.__dict__["cert_" + key] = value
+        self.certificate.update_existing(update)
 
         return True
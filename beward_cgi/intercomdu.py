@@ -1,12 +1,184 @@
 #!/usr/bin/python
 # coding=utf8
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
 from logging import getLogger
 from time import sleep
 
+from requests import RequestException
+
 from .general.module import BewardIntercomModule, BewardIntercomModuleError
 
 LOGGER = getLogger(__name__)
 
+# Размеры матрицы коммутатора по (адрес панели, версия прошивки)
+DIMENSIONS_CACHE = {}
+# Верхняя граница поиска размера матрицы
+MAX_DIMENSION = 1024
+
+
+def find_first_missing(exists, limit=MAX_DIMENSION):
+    """Поиск первого несуществующего индекса.
+
+    Индексы 0..n-1 существуют, начиная с n - нет. Граница ищется
+    удвоением индекса, затем двоичным поиском, поэтому нужно O(log n)
+    запросов вместо n + 1.
+
+    Args:
+        exists (callable): проверка существования индекса.
+        limit (int): индекс, который считается несуществующим.
+
+    Returns:
+        int: первый несуществующий индекс n.
+    """
+    if not exists(0):
+        return 0
+    low, high = 0, 1
+    while high < limit and exists(high):
+        low, high = high, high * 2
+    high = min(high, limit)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if exists(middle):
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+class KkmMatrix(object):
+    """Матрица коммутатора в типизированном массиве.
+
+    Ячейка хранит номер квартиры как целое число, 0 - ячейка не занята,
+    MISSING - значение ячейки не получено с панели. В дампах матрица
+    представлена вложенными списками строк [Index][Dozens][Units].
+    """
+
+    MISSING = -1
+
+    __slots__ = ("tables", "dozens", "units", "cells")
+
+    def __init__(self, tables, dozens, units, cells=None):
+        """Инициализация матрицы.
+
+        Args:
+            tables (int): количество таблиц.
+            dozens (int): количество десятков в таблице.
+            units (int): количество единиц в десятке.
+            cells (array, optional): значения ячеек подряд. По умолчанию
+                все ячейки не заняты.
+        """
+        self.tables = tables
+        self.dozens = dozens
+        self.units = units
+        size = tables * dozens * units
+        if cells is None:
+            cells = array("l", bytes(size * array("l").itemsize))
+        elif len(cells) != size:
+            raise ValueError("Matrix size mismatch")
+        self.cells = cells
+
+    def __repr__(self):
+        return "KkmMatrix({}x{}x{})".format(self.tables, self.dozens, self.units)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, KkmMatrix)
+            and self.shape == other.shape
+            and self.cells == other.cells
+        )
+
+    @property
+    def shape(self):
+        return (self.tables, self.dozens, self.units)
+
+    def _offset(self, cell):
+        index, dozen, unit = cell
+        if not (
+            0 <= index < self.tables
+            and 0 <= dozen < self.dozens
+            and 0 <= unit < self.units
+        ):
+            raise IndexError(cell)
+        return (index * self.dozens + dozen) * self.units + unit
+
+    def _position(self, offset):
+        rest, unit = divmod(offset, self.units)
+        index, dozen = divmod(rest, self.dozens)
+        return index, dozen, unit
+
+    def __getitem__(self, cell):
+        value = self.cells[self._offset(cell)]
+        return None if value == self.MISSING else str(value)
+
+    def __setitem__(self, cell, value):
+        self.cells[self._offset(cell)] = (
+            self.MISSING if value is None else int(value)
+        )
+
+    def copy(self):
+        return KkmMatrix(self.tables, self.dozens, self.units, array("l", self.cells))
+
+    def diff(self, other):
+        """Ячейки, значения которых отличаются от other.
+
+        Ячейки без значения не учитываются.
+
+        Args:
+            other (KkmMatrix): матрица того же размера.
+
+        Yields:
+            tuple: ((Index, Dozens, Units), значение строкой).
+        """
+        if self.shape != other.shape:
+            raise ValueError("Matrix size mismatch")
+        missing = self.MISSING
+        for offset, (value, old) in enumerate(zip(self.cells, other.cells)):
+            if value != old and value != missing:
+                yield self._position(offset), str(value)
+
+    def iter_filled(self):
+        """Занятые ячейки.
+
+        Yields:
+            tuple: ((Index, Dozens, Units), значение строкой).
+        """
+        for offset, value in enumerate(self.cells):
+            if value > 0:
+                yield self._position(offset), str(value)
+
+    def to_list(self):
+        """Матрица вложенными списками строк для дампа."""
+        matrix = []
+        offset = 0
+        for _ in range(self.tables):
+            table = []
+            for _ in range(self.dozens):
+                row = self.cells[offset:offset + self.units]
+                table.append([None if value == self.MISSING else str(value) for value in row])
+                offset += self.units
+            matrix.append(table)
+        return matrix
+
+    @classmethod
+    def from_list(cls, matrix):
+        """Матрица из вложенных списков [Index][Dozens][Units]."""
+        tables = len(matrix)
+        dozens = len(matrix[0]) if tables else 0
+        units = len(matrix[0][0]) if dozens else 0
+        kkm_matrix = cls(tables, dozens, units)
+        for index, table in enumerate(matrix):
+            for dozen, row in enumerate(table):
+                if len(row) != units:
+                    raise ValueError("Matrix rows must have equal length")
+                for unit, value in enumerate(row):
+                    kkm_matrix[index, dozen, unit] = value
+        return kkm_matrix
+
 
 class IntercomduModule(BewardIntercomModule):
     """Модуль взаимодействия с cgi intercomdu_cgi"""
@@ -26,92 +198,132 @@ class IntercomduModule(BewardIntercomModule):
             password,
             cgi,
         )
+        self.matrix_errors = {}
+        self._loaded_matrix = None
 
     def __str__(self):
         return "IntercomduModule"
 
-    def load_params(self):
-        """Метод получения параметров установленных на панели."""
-
-        table_index = self._get_table_index()
-        dozens = self._get_table_dozens()
-        units = self._get_table_units()
-        kkm_matrix = []
-        for i in range(table_index):
-            index = []
-            for d in range(dozens):
-                dozen = []
-                for u in range(units):
-                    response = self.client.query(
-                        setting=self.cgi,
-                        params={
-                            "action": "get",
-                            "Index": str(i),
-                            "Dozens": str(d),
-                            "Units": str(u),
-                        },
-                    )
-                    response = self.client.parse_response(response)
-                    content = response.get("content").get("message")
-                    dozen.append(content)
-                index.append(dozen)
-            kkm_matrix.append(index)
-        self.__dict__["param_Matrix"] = kkm_matrix
-        self.__dict__["param_Type"] = self._get_kkm_type()
+    def load_params(self, max_workers=8):
+        """Метод получения параметров установленных на панели.
 
-    def _get_table_index(self):
-        """Получить индекс таблиц"""
-        code = 200
-        index = -1
-        while code == 200:
-            index += 1
-            response = self.client.query(
-                setting=self.cgi,
-                params={
-                    "action": "get",
-                    "Index": str(index),
-                },
+        Ячейки матрицы коммутатора запрашиваются параллельно через общую
+        keep-alive сессию клиента. Порядок ячеек в матрице сохраняется.
+        Ячейки, которые не удалось получить, остаются без значения, а ошибки
+        сохраняются в matrix_errors с ключом (Index, Dozens, Units).
+        Загруженная матрица запоминается для записи только изменений.
+
+        Args:
+            max_workers (int): количество одновременных запросов ячеек.
+        """
+
+        tables, dozens, units = self._get_dimensions()
+        kkm_matrix = KkmMatrix(tables, dozens, units)
+        self.matrix_errors = {}
+        cells = product(range(tables), range(dozens), range(units))
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(self._get_cell, *cell): cell for cell in cells
+            }
+            for future in as_completed(futures):
+                cell = futures[future]
+                try:
+                    kkm_matrix[cell] = future.result()
+                except (BewardIntercomModuleError, RequestException, ValueError) as err:
+                    kkm_matrix[cell] = None
+                    self.matrix_errors[cell] = str(err)
+
+        if self.matrix_errors:
+            LOGGER.warning(
+                "Не удалось получить {} ячеек коммутатора: {}".format(
+                    len(self.matrix_errors),
+                    sorted(self.matrix_errors),
+                ),
+            )
+        self.params["Matrix"] = kkm_matrix
+        self.params["Type"] = self._get_kkm_type()
+        self._loaded_matrix = kkm_matrix.copy()
+
+    def _get_cell(self, index, dozen, unit):
+        """Получить значение ячейки коммутатора."""
+        response = self.client.query(
+            setting=self.cgi,
+            params={
+                "action": "get",
+                "Index": str(index),
+                "Dozens": str(dozen),
+                "Units": str(unit),
+            },
+        )
+        response = self.client.parse_response(response)
+        content = response.get("content", {})
+        if response.get("code") != 200:
+            raise BewardIntercomModuleError(content.get("message", "Unknown error."))
+        return content.get("message")
+
+    def _get_dimensions(self):
+        """Размеры матрицы коммутатора с кэшем по адресу и прошивке панели.
+
+        Returns:
+            tuple: количество таблиц, десятков в таблице и единиц в десятке.
+
+        Raises:
+            BewardIntercomModuleError: если матрица коммутатора не найдена.
+        """
+        firmware = self._get_firmware()
+        key = (self.client.ip, firmware)
+        dimensions = DIMENSIONS_CACHE.get(key)
+        if dimensions is None:
+            dimensions = (
+                self._get_table_index(),
+                self._get_table_dozens(),
+                self._get_table_units(),
             )
-            response = self.client.parse_response(response)
-            code = response.get("code")
-        return index - 1
+            if min(dimensions) <= 0:
+                raise BewardIntercomModuleError(
+                    "Intercomdu matrix is not found, dimensions: {}x{}x{}".format(
+                        *dimensions
+                    ),
+                )
+            if firmware is not None:
+                DIMENSIONS_CACHE[key] = dimensions
+        else:
+            LOGGER.debug("Размеры коммутатора {} из кэша: {}".format(key, dimensions))
+        return dimensions
+
+    def _get_firmware(self):
+        """Версия прошивки панели или None, если ее не удалось получить."""
+        response = self.client.query(
+            setting="cgi-bin/systeminfo_cgi",
+            params={"action": "get"},
+        )
+        response = self.client.parse_response(response)
+        if response.get("code") != 200:
+            return None
+        return response.get("content", {}).get("SoftwareVersion")
+
+    def _exists(self, **params):
+        """Проверка существования элемента матрицы."""
+        params["action"] = "get"
+        response = self.client.query(setting=self.cgi, params=params)
+        return response.status_code == 200
+
+    def _get_table_index(self):
+        """Получить количество таблиц"""
+        return find_first_missing(lambda index: self._exists(Index=str(index)))
 
     def _get_table_dozens(self):
         """Получить количество десятков таблицы"""
-        code = 200
-        dozens = -1
-        while code == 200:
-            dozens += 1
-            response = self.client.query(
-                setting=self.cgi,
-                params={
-                    "action": "get",
-                    "Index": "0",
-                    "Dozens": str(dozens),
-                },
-            )
-            response = self.client.parse_response(response)
-            code = response.get("code")
-        return dozens - 1
+        return find_first_missing(
+            lambda dozens: self._exists(Index="0", Dozens=str(dozens)),
+        )
 
     def _get_table_units(self):
         """Получить количество едениц в десяке"""
-        code = 200
-        units = -1
-        while code == 200:
-            units += 1
-            response = self.client.query(
-                setting=self.cgi,
-                params={
-                    "action": "get",
-                    "Index": "0",
-                    "Dozens": "0",
-                    "Units": str(units),
-                },
-            )
-            response = self.client.parse_response(response)
-            code = response.get("code")
-        return units - 1
+        return find_first_missing(
+            lambda units: self._exists(Index="0", Dozens="0", Units=str(units)),
+        )
 
     def _get_kkm_type(self):
         """Получить тип комутатора"""
@@ -123,33 +335,93 @@ class IntercomduModule(BewardIntercomModule):
             raise BewardIntercomModuleError(content.get("message", "Unknown error."))
         return content["Type"]
 
-    def set_params(self, fill_kkm_timeout=2):
+    def _get_matrix(self):
+        """Матрица коммутатора как KkmMatrix.
 
-        """Метод загрузки параметров на панель панели."""
+        После set_dump или update_params матрица может быть передана
+        вложенными списками, она преобразуется и сохраняется в модуле.
+        """
+        matrix = self.params.get("Matrix")
+        if matrix is None:
+            return None
+        if not isinstance(matrix, KkmMatrix):
+            matrix = KkmMatrix.from_list(matrix)
+            self.params["Matrix"] = matrix
+        return matrix
 
-        params = self.get_params()
-        matrix = params.pop("Matrix")
-        params["action"] = "fill"
-        response = self.client.query(setting=self.cgi, params=params)
-        if response.status_code != 200:
-            raise BewardIntercomModuleError("Error, %s" % response.status_code)
-        sleep(fill_kkm_timeout)
-        LOGGER.debug("", response)
-        for index in matrix:
-            for dozen in index:
-                for unit in dozen:
-                    if unit == "0":
-                        continue
-                    params = {
-                        "action": "set",
-                        "Index": str(index),
-                        "Dozens": str(dozen),
-                        "Units": str(unit),
-                    }
-                    response = self.client.query(
-                        setting=self.cgi,
-                        params=params,
-                    )
-                    if response.status_code != 200:
-                        LOGGER.debug("", response)
+    def get_params(self):
+        """Получить параметры с панели, матрица - вложенными списками."""
+        params = super(IntercomduModule, self).get_params()
+        matrix = self._get_matrix()
+        if matrix is not None:
+            params["Matrix"] = matrix.to_list()
+        return params
+
+    def reset_loaded_params(self):
+        """Забыть загруженные параметры и матрицу.
+
+        Следующий set_params перезапишет коммутатор целиком.
+        """
+        super(IntercomduModule, self).reset_loaded_params()
+        self._loaded_matrix = None
+
+    def set_params(self, fill_kkm_timeout=2, full=False):
+        """Метод загрузки параметров на панель панели.
+
+        Записываются только ячейки, измененные после load_params. Полная
+        перезапись через fill с ожиданием выполняется, если full=True или
+        матрица не загружалась с панели либо изменила размер.
+
+        Args:
+            fill_kkm_timeout (int): ожидание после fill в секундах.
+            full (bool): очистить коммутатор и записать все занятые ячейки.
+        """
+        matrix = self._get_matrix()
+        if matrix is None:
+            raise BewardIntercomModuleError("Matrix is not loaded.")
+        loaded = self._loaded_matrix
+        self.matrix_errors = {}
+
+        if full or loaded is None or loaded.shape != matrix.shape:
+            params = self.get_params()
+            params.pop("Matrix")
+            params["action"] = "fill"
+            response = self.client.query(setting=self.cgi, params=params)
+            if response.status_code != 200:
+                raise BewardIntercomModuleError("Error, %s" % response.status_code)
+            sleep(fill_kkm_timeout)
+            LOGGER.debug("", response)
+            loaded = KkmMatrix(*matrix.shape)
+            self._loaded_matrix = loaded
+            changes = matrix.iter_filled()
+        else:
+            changes = matrix.diff(loaded)
+
+        for cell, value in changes:
+            index, dozen, unit = cell
+            params = {
+                "action": "set",
+                "Index": str(index),
+                "Dozens": str(dozen),
+                "Units": str(unit),
+                "Apartment": value,
+            }
+            try:
+                response = self.client.query(setting=self.cgi, params=params)
+            except RequestException as err:
+                self.matrix_errors[cell] = str(err)
+                continue
+            if response.status_code != 200:
+                LOGGER.debug("", response)
+                self.matrix_errors[cell] = "Error, %s" % response.status_code
+                continue
+            loaded[cell] = value
+
+        if self.matrix_errors:
+            LOGGER.warning(
+                "Не удалось записать {} ячеек коммутатора: {}".format(
+                    len(self.matrix_errors),
+                    sorted(self.matrix_errors),
+                ),
+            )
         return True
@@ -0,0 +1,337 @@
+#!/usr/bin/python
+# coding=utf8
+from array import array
+from logging import getLogger
+
+from .beward_key import Key
+
+LOGGER = getLogger(__name__)
+
+"""Модуль содержащий колоночную таблицу ключей
+"""
+
+
+def _parse_int(value, default):
+    return int(value) if value else default
+
+
+def _parse_hex(value):
+    """Шестнадцатеричное значение и количество знаков для обратного вывода."""
+    return int(value, 16), len(value)
+
+
+class KeyTable(object):
+    """Таблица ключей RFID и MIFARE, хранимая по колонкам.
+
+    UID и Code хранятся числами в array вместе с количеством
+    шестнадцатеричных знаков, числовые параметры - в array подходящего
+    размера, флаги ProtectedMode, NewCipherEnable, AutoPersonalize и
+    Service упакованы в биты 0-3 одного байта, владелец - в словаре только
+    для ключей с непустым Owner. Пустые числовые параметры заменяются значениями
+    по умолчанию Key.default_params.
+
+    Ключи сравниваются по UID, как и в базе панели. Операции над таблицами
+    (|, &, -, changed) выполняются над множествами UID и возвращают новые
+    таблицы в порядке строк исходной таблицы. Если UID повторяется,
+    учитывается последняя строка.
+
+    Пример:
+        table = KeyTable.from_export(response.content)
+        missing = KeyTable.from_export(eqm_lines) - table
+    """
+
+    columns = (
+        "uid",
+        "uid_len",
+        "type",
+        "flags",
+        "cipher_index",
+        "new_cipher_index",
+        "code",
+        "code_len",
+        "sector",
+        "apartment",
+    )
+
+    __slots__ = columns + ("owners", "_index")
+
+    def __init__(self, lines=None):
+        """Инициализация таблицы.
+
+        Args:
+            lines (Iterable[str], optional): строки ключей в формате RFID
+                или MIFARE, как в Key.
+        """
+        self.uid = array("Q")
+        self.uid_len = array("B")
+        self.type = array("b")
+        self.flags = array("B")
+        self.cipher_index = array("H")
+        self.new_cipher_index = array("H")
+        self.code = array("L")
+        self.code_len = array("B")
+        self.sector = array("H")
+        self.apartment = array("l")
+        self.owners = {}
+        self._index = None
+        if lines is not None:
+            self.extend(lines)
+
+    def __len__(self):
+        return len(self.uid)
+
+    def __iter__(self):
+        """Ключи таблицы объектами Key."""
+        for row in range(len(self.uid)):
+            yield self.get_key(row)
+
+    def __repr__(self):
+        return "KeyTable({} keys)".format(len(self.uid))
+
+    def __contains__(self, key):
+        """Есть ли в таблице ключ с UID.
+
+        Args:
+            key (Union[int, str, Key]): UID числом, строкой или ключ.
+        """
+        if isinstance(key, Key):
+            key = key.param_Key
+        if isinstance(key, str):
+            key = int(key, 16)
+        return key in self.index
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    @classmethod
+    def from_export(cls, content):
+        """Таблица из выгрузки action=export за один проход.
+
+        Args:
+            content (Union[bytes, str, Iterable[str]]): тело ответа панели
+                или строки ключей.
+        """
+        if isinstance(content, bytes):
+            content = content.decode("UTF-8")
+        if isinstance(content, str):
+            content = content.splitlines()
+        return cls(content)
+
+    @classmethod
+    def from_keys(cls, keys):
+        """Таблица из объектов Key."""
+        return cls(key.get_key_string("MIFARE") for key in keys)
+
+    @property
+    def index(self):
+        """Словарь UID - номер строки."""
+        if self._index is None:
+            self._index = dict(zip(self.uid, range(len(self.uid))))
+        return self._index
+
+    def extend(self, lines):
+        """Добавить ключи из строк в формате RFID или MIFARE.
+
+        Строки, которые не удалось разобрать, пропускаются с предупреждением.
+        """
+        defaults = Key.default_params
+        default_type = int(defaults["Type"])
+        default_sector = int(defaults["Sector"])
+        uid_append = self.uid.append
+        uid_len_append = self.uid_len.append
+        type_append = self.type.append
+        flags_append = self.flags.append
+        cipher_append = self.cipher_index.append
+        new_cipher_append = self.new_cipher_index.append
+        code_append = self.code.append
+        code_len_append = self.code_len.append
+        sector_append = self.sector.append
+        apartment_append = self.apartment.append
+        owners = self.owners
+        row = len(self.uid)
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            fields = line.split(",")
+            try:
+                if len(fields) == 12:
+                    (
+                        uid,
+                        key_type,
+                        protected,
+                        cipher,
+                        new_enable,
+                        new_cipher,
+                        code,
+                        sector,
+                        apartment,
+                        owner,
+                        personalize,
+                        service,
+                    ) = fields
+                    key_type = _parse_int(key_type, default_type)
+                    flags = (
+                        (protected == "1")
+                        | (new_enable == "1") << 1
+                        | (personalize == "1") << 2
+                        | (service == "1") << 3
+                    )
+                    cipher = _parse_int(cipher, 0)
+                    new_cipher = _parse_int(new_cipher, 0)
+                    code, code_len = _parse_hex(code or "0")
+                    sector = _parse_int(sector, default_sector)
+                elif len(fields) in (1, 2):
+                    uid = fields[0]
+                    apartment = fields[1] if len(fields) == 2 else ""
+                    key_type, flags, cipher, new_cipher = default_type, 0, 0, 0
+                    code, code_len, sector, owner = 0, 1, default_sector, ""
+                else:
+                    raise ValueError("Wrong number of parameters")
+                uid, uid_len = _parse_hex(uid)
+                apartment = _parse_int(apartment, 0)
+                # Обработка неизвестных ключей с Type == -1
+                if key_type == -1:
+                    key_type = default_type
+                uid_append(uid)
+                uid_len_append(uid_len)
+                type_append(key_type)
+                flags_append(flags)
+                cipher_append(cipher)
+                new_cipher_append(new_cipher)
+                code_append(code)
+                code_len_append(code_len)
+                sector_append(sector)
+                apartment_append(apartment)
+            except (ValueError, OverflowError) as err:
+                # Значение вне диапазона колонки: убрать начатую строку
+                for name in self.columns:
+                    del getattr(self, name)[row:]
+                LOGGER.warning("Error init key <{}>: {}".format(line, err))
+                continue
+            if owner:
+                owners[row] = owner
+            row += 1
+        self._index = None
+        return self
+
+    def get_uid(self, row):
+        """UID ключа строки строкой, как в выгрузке панели."""
+        return "{:0{}X}".format(self.uid[row], self.uid_len[row])
+
+    def record(self, row, format_type="MIFARE"):
+        """Параметры строки кортежем чисел для сравнения ключей.
+
+        Для формата RFID сравниваются только UID и квартира.
+        """
+        if format_type == "RFID":
+            return self.uid[row], self.apartment[row]
+        return (
+            self.uid[row],
+            self.type[row],
+            self.flags[row],
+            self.cipher_index[row],
+            self.new_cipher_index[row],
+            self.code[row],
+            self.sector[row],
+            self.apartment[row],
+            self.owners.get(row, ""),
+        )
+
+    def get_key_string(self, row, format_type="MIFARE"):
+        """Ключ строки в формате Key.get_key_string."""
+        uid = self.get_uid(row)
+        if format_type == "RFID":
+            return "{},{}".format(uid, self.apartment[row])
+        if format_type != "MIFARE":
+            return ""
+        flags = self.flags[row]
+        return "{},{},{},{},{},{},{:0{}X},{},{},{},{},{}".format(
+            uid,
+            self.type[row],
+            flags & 1,
+            self.cipher_index[row],
+            flags >> 1 & 1,
+            self.new_cipher_index[row],
+            self.code[row],
+            self.code_len[row],
+            self.sector[row],
+            self.apartment[row],
+            self.owners.get(row, ""),
+            flags >> 2 & 1,
+            flags >> 3 & 1,
+        )
+
+    def iter_key_strings(self, format_type="MIFARE"):
+        """Ключи таблицы строками по одному, например для action=import."""
+        for row in range(len(self.uid)):
+            yield self.get_key_string(row, format_type)
+
+    def get_key_strings(self, format_type="MIFARE"):
+        """Все ключи таблицы строками."""
+        return list(self.iter_key_strings(format_type))
+
+    def get_key(self, row):
+        """Ключ строки объектом Key."""
+        return Key(self.get_key_string(row))
+
+    def take(self, rows):
+        """Новая таблица из строк rows в указанном порядке."""
+        rows = list(rows)
+        table = type(self)()
+        for name in self.columns:
+            column = getattr(self, name)
+            getattr(table, name).extend([column[row] for row in rows])
+        owners = self.owners
+        if owners:
+            table.owners = {
+                num: owners[row] for num, row in enumerate(rows) if row in owners
+            }
+        return table
+
+    def _rows(self, uids):
+        return sorted(map(self.index.__getitem__, uids))
+
+    def union(self, other):
+        """Ключи обеих таблиц, для общих UID - строки этой таблицы."""
+        index = self.index
+        table = self.take(self._rows(index.keys()))
+        added = other.take(other._rows(other.index.keys() - index.keys()))
+        for name in self.columns:
+            getattr(table, name).extend(getattr(added, name))
+        offset = len(index)
+        table.owners.update(
+            (row + offset, owner) for row, owner in added.owners.items()
+        )
+        return table
+
+    def intersection(self, other):
+        """Ключи этой таблицы, UID которых есть в other."""
+        return self.take(self._rows(self.index.keys() & other.index.keys()))
+
+    def difference(self, other):
+        """Ключи этой таблицы, UID которых нет в other."""
+        return self.take(self._rows(self.index.keys() - other.index.keys()))
+
+    def changed(self, other, format_type="MIFARE"):
+        """Ключи этой таблицы, которые есть в other с другими параметрами.
+
+        Args:
+            other (KeyTable): таблица для сравнения.
+            format_type (str): формат ключей RFID или MIFARE, для RFID
+                сравнивается только квартира.
+        """
+        other_index = other.index
+        return self.take(
+            row
+            for row in self._rows(self.index.keys() & other_index.keys())
+            if self.record(row, format_type)
+            != other.record(other_index[self.uid[row]], format_type)
+        )
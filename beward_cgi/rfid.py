@@ -1,17 +1,39 @@
 #!/usr/bin/python
 # coding=utf8
-from io import BytesIO
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
 from logging import getLogger
+from time import sleep
+
+from requests import RequestException
 
 from .beward_key import Key
+from .key_table import KeyTable
 from .general.dump_creator import JSONDumpFormatter, make_dumps
+from .general.breaker import CircuitOpenError
+from .general.client import iter_body_lines
 from .general.module import BewardIntercomModule, BewardIntercomModuleError
+from .general.multipart import MultipartPayload
+from .general.params import ParamStore
 
 LOGGER = getLogger(__name__)
 
 
 class RfidModule(BewardIntercomModule):
-    """Модуль взаимодействия с cgi rfid_cgi"""
+    """Модуль взаимодействия с cgi rfid_cgi
+
+    Ключи хранятся в self.keys, атрибуты key_<номер> читают и записывают
+    соответствующий ключ.
+    """
+
+    ATTRIBUTE_STORES = (("param_", "params"), ("key_", "keys"))
+    # Изменений ключей, до которого sync_keys отправляет запросы по ключу,
+    # при большем количестве база загружается целиком через action=import
+    sync_threshold = 100
+    # Ключей в части загрузки upload_keys_chunked
+    import_chunk_size = 5000
 
     def __init__(
         self,
@@ -22,6 +44,7 @@ class RfidModule(BewardIntercomModule):
         cgi="cgi-bin/rfid_cgi",
     ):
         self.format_type = "RFID"
+        self.keys = ParamStore()
         super(RfidModule, self).__init__(
             client,
             ip,
@@ -44,24 +67,75 @@ class RfidModule(BewardIntercomModule):
 
     def load_keys_from_panel(self):
         """Получение ключей из панели."""
+        num = 0
+        for num, key in enumerate(self.iter_keys_from_panel(), 1):
+            self.keys[str(num)] = key
+        if not num:
+            LOGGER.warning("No keys found.")
+
+    def iter_export_lines(self):
+        """Строки выгрузки action=export по мере получения от панели.
+
+        Ответ читается потоком частями STREAM_CHUNK_SIZE клиента, без кэша
+        ответов, поэтому разбор идет одновременно с передачей.
+
+        Yields:
+            str: непустая строка ключа.
+
+        Raises:
+            BewardIntercomModuleError: если панель вернула ошибку или модуль
+                ключей не поддерживается панелью.
+        """
         response = self.client.query(
             setting=self.cgi,
             params={"action": "export"},
+            stream=True,
         )
-        response = self.client.parse_response(response)
-        content = response.get("content", {})
+        try:
+            if response.status_code != 200:
+                content = self.client.parse_response(response).get("content", {})
+                if content["message"]:
+                    raise BewardIntercomModuleError(
+                        "Parsing error. Response: {}".format(content["message"]),
+                    )
+                raise BewardIntercomModuleError("Unknown error.")
+
+            chunks = response.iter_content(self.client.STREAM_CHUNK_SIZE)
+            for line in iter_body_lines(chunks):
+                if not line:
+                    continue
+                if "is not defined" in line:
+                    raise BewardIntercomModuleError("Module is not defined")
+                yield line
+        finally:
+            response.close()
+
+    def iter_keys_from_panel(self):
+        """Ключи панели объектами Key по мере получения выгрузки.
+
+        Строки, которые не удалось разобрать, пропускаются с
+        предупреждением.
+        """
+        for line in self.iter_export_lines():
+            try:
+                yield Key(key_string=line)
+            except ValueError as err:
+                LOGGER.warning("Error init key <{}>: {}".format(line, err))
 
-        if response.get("code") != 200:
+    def load_key_table(self):
+        """Получение базы ключей панели таблицей KeyTable.
 
-            if content["message"]:
-                raise BewardIntercomModuleError(
-                    "Parsing error. Response: {}".format(content["message"]),
-                )
-            else:
-                raise BewardIntercomModuleError(content.get("message", "Unknown error."))
+        Таблица заполняется по мере получения выгрузки action=export без
+        создания объектов Key и не меняет ключи модуля.
+
+        Returns:
+            KeyTable: ключи панели.
+        """
+        return KeyTable(self.iter_export_lines())
 
-        keys = [value for _, value in content.items() if value]
-        self.loads_keys(keys, keys_type="KEYSTRING")
+    def get_key_table(self):
+        """Ключи модуля таблицей KeyTable."""
+        return KeyTable.from_keys(self.keys.values())
 
     def get_keys(self, format_type):
         """Получить базу ключей.
@@ -70,29 +144,65 @@ class RfidModule(BewardIntercomModule):
             format_type (Union[Literal["MIFARE"], Literal["RFID"]]): формат
             ключей.
         """
-        keys = []
-        for key, value in self.__dict__.items():
-            if key[:4] == "key_":
-                keys.append(value.get_params(format_type))
-        return tuple(keys)
+        return tuple(key.get_params(format_type) for key in self.keys.values())
 
-    def upload_keys(self):
+    def upload_keys(self, payload=None, keys=None):
         """Загрузка ключей на панель
+
+        Файл ключей отправляется потоком и не собирается в памяти.
+
         Args:
-            format_type (Union[Literal["MIFARE"], Literal["RFID"]]): формат
-            ключей.
+            payload (MultipartPayload, optional): готовое тело загрузки из
+                make_keys_payload, например одно для нескольких панелей.
+            keys (Union[KeyTable, Iterable[Key]], optional): ключи для
+                загрузки, если payload не передан. По умолчанию ключи модуля.
+        """
+        if payload is None:
+            payload = self.make_keys_payload(keys)
+        return self._import_keys(payload)
+
+    def make_keys_payload(self, keys=None, chunked=False):
+        """Потоковое тело action=import.
+
+        Строки ключей генерируются заново при каждой отправке, поэтому
+        тело можно отправлять на несколько панелей с одним форматом ключей.
+        Одноразовый итератор ключей, например генератор, сохраняется в
+        список: тело обходится дважды, для длины и для отправки.
+
+        Args:
+            keys (Union[KeyTable, Iterable[Key]], optional): ключи. По
+                умолчанию ключи модуля.
+            chunked (bool): отправлять с Transfer-Encoding: chunked без
+                предварительного подсчета длины.
+
+        Returns:
+            MultipartPayload: тело запроса.
+        """
+        format_type = self.format_type
+        if keys is None:
+            keys = self.keys.values()
+        elif iter(keys) is keys:
+            keys = list(keys)
+
+        def lines():
+            if isinstance(keys, KeyTable):
+                return keys.iter_key_strings(format_type)
+            return (key.get_key_string(format_type) for key in keys)
+
+        return MultipartPayload("file", "keys.csv", lines, chunked=chunked)
+
+    def _import_keys(self, payload, timeout=600):
+        """Замена базы ключей панели через action=import.
+
+        Args:
+            payload (MultipartPayload): тело запроса с файлом ключей.
+            timeout (int): время ожидания ответа панели в секундах.
         """
-        buf = BytesIO()
-        for key, value in self.__dict__.items():
-            if key[:4] == "key_":
-                buf.write(
-                    (value.get_key_string(self.format_type) + "\n").encode("utf-8"),
-                )
         response = self.client.query_post(
             setting=self.cgi,
             params={"action": "import"},
-            files={"file": ("keys.csv", buf.getvalue())},
-            timeout=600,
+            data=payload,
+            timeout=timeout,
         )
         response = self.client.parse_response(response)
         content = response.get("content", {})
@@ -104,9 +214,256 @@ class RfidModule(BewardIntercomModule):
             raise BewardIntercomModuleError(
                 "Parsing error. Response: {}".format(content["message"]),
             )
-        buf.close()
         return True
 
+    def upload_keys_chunked(
+        self,
+        keys=None,
+        chunk_size=None,
+        checkpoint=None,
+        timeout=600,
+        max_workers=1,
+        retries=2,
+    ):
+        """Загрузка базы ключей частями с продолжением после прерывания.
+
+        action=import заменяет всю базу панели, поэтому часть нельзя
+        загрузить отдельно от предыдущих: каждый import отправляет ключи от
+        начала таблицы до конца очередной части и проверяется по выгрузке
+        панели. Первая часть содержит chunk_size ключей, каждая следующая -
+        столько же, сколько все предыдущие вместе. Так всего отправляется
+        меньше 2n ключей за log2(n / chunk_size) + 1 запросов import, а
+        ошибка стоит повтора одного import. После подтвержденной части ее
+        конец сохраняется в checkpoint.
+
+        Если checkpoint для этой панели уже есть, загрузка продолжается со
+        следующей части. Набор ключей при этом берется из снимка рядом с
+        checkpoint, а keys не используются: после прерванной загрузки на
+        панели остается только часть ключей, и заново собранный набор может
+        их потерять. Перед продолжением база панели выгружается один раз.
+        Если на панели нет лишних ключей, а недостающих до конца следующей
+        части не больше sync_threshold, они добавляются через add, иначе
+        часть загружается через import заново. После загрузки всех частей
+        checkpoint и снимок удаляются.
+
+        Args:
+            keys (Union[KeyTable, Iterable[str]], optional): ключи таблицей
+                или строками. По умолчанию ключи модуля.
+            chunk_size (int, optional): ключей в первой части. По умолчанию
+                import_chunk_size.
+            checkpoint (str, optional): путь к файлу состояния загрузки.
+                Без него загрузку нельзя продолжить после прерывания.
+            timeout (int): время ожидания ответа панели на import.
+            max_workers (int): количество одновременных запросов add при
+                продолжении загрузки.
+            retries (int): количество повторов add для ключа после ошибки.
+
+        Returns:
+            dict: ключей всего (total), подтверждено через import (imported),
+            добавлено через add (added) и номер ключа, с которого
+            продолжена загрузка (resumed_from).
+
+        Raises:
+            BewardIntercomModuleError: если панель вернула ошибку, часть не
+                совпала с выгрузкой панели или ключи не добавлены.
+        """
+        state = self.load_import_checkpoint(checkpoint) if checkpoint else None
+        if state is not None:
+            table = KeyTable(self._iter_snapshot(checkpoint))
+            fingerprint = state["fingerprint"]
+            chunk_size = state["chunk_size"]
+            start = state["confirmed"]
+        else:
+            if keys is None:
+                keys = self.get_key_table()
+            elif not isinstance(keys, KeyTable):
+                keys = KeyTable(keys)
+            # Для повторяющихся UID остается последняя строка, как на панели
+            table = keys.take(sorted(keys.index.values()))
+            chunk_size = chunk_size or self.import_chunk_size
+            start = 0
+            fingerprint = self._fingerprint(table) if checkpoint else None
+            if checkpoint:
+                self._save_snapshot(checkpoint, table)
+
+        def _save(confirmed):
+            if checkpoint:
+                self._save_import_state(checkpoint, {
+                    "ip": self.client.ip,
+                    "fingerprint": fingerprint,
+                    "chunk_size": chunk_size,
+                    "total": len(table),
+                    "confirmed": confirmed,
+                })
+
+        total = len(table)
+        result = {"total": total, "imported": 0, "added": 0, "resumed_from": start}
+        if not start:
+            _save(0)
+
+        chunk_start = start
+        for chunk_end in self._iter_chunk_ends(total, chunk_size):
+            if chunk_end <= chunk_start and chunk_end < total:
+                continue
+            prefix = table.take(range(chunk_end))
+            rows = None
+            if chunk_start == start and start:
+                rows = self._resume_rows(prefix)
+            if rows is not None:
+                self._add_rows(prefix, rows, max_workers, retries)
+                result["added"] += len(rows)
+            else:
+                self._import_keys(self.make_keys_payload(prefix), timeout=timeout)
+                if not self._verify_import(prefix):
+                    raise BewardIntercomModuleError(
+                        "Keys {}-{} of {} not confirmed by panel.".format(
+                            chunk_start + 1,
+                            chunk_end,
+                            total,
+                        ),
+                    )
+                result["imported"] += chunk_end - chunk_start
+            LOGGER.debug("{}: {} of {} keys confirmed.".format(self.client.ip, chunk_end, total))
+            _save(chunk_end)
+            chunk_start = chunk_end
+
+        if checkpoint:
+            for path in (checkpoint, checkpoint + ".keys"):
+                if os.path.exists(path):
+                    os.remove(path)
+        return result
+
+    @staticmethod
+    def _iter_chunk_ends(total, chunk_size):
+        """Концы частей upload_keys_chunked: chunk_size, 2 * chunk_size,
+        4 * chunk_size и так далее до total."""
+        chunk_end = min(chunk_size, total)
+        while True:
+            yield chunk_end
+            if chunk_end >= total:
+                return
+            chunk_end = min(chunk_end * 2, total)
+
+    def _resume_rows(self, prefix):
+        """Строки ключей до конца части, которые можно добавить через add
+        при продолжении загрузки.
+
+        Returns:
+            list: недостающие на панели строки или None, если часть нужно
+            загрузить через import: на панели есть ключи не из prefix или
+            недостающих ключей больше sync_threshold.
+        """
+        panel_keys = self.load_key_table()
+        if len(panel_keys - prefix):
+            return None
+        rows = self._missing_rows(prefix, panel_keys)
+        if len(rows) > self.sync_threshold:
+            return None
+        if rows:
+            LOGGER.warning(
+                "{}: {} keys of interrupted chunk not found on panel.".format(
+                    self.client.ip,
+                    len(rows),
+                ),
+            )
+        return rows
+
+    def _add_rows(self, table, rows, max_workers, retries):
+        """Добавить строки таблицы через add.
+
+        Raises:
+            BewardIntercomModuleError: если хотя бы один ключ не добавлен.
+        """
+        if not rows:
+            return
+        added = self.slow_upload_keys(
+            table.take(rows),
+            max_workers=max_workers,
+            retries=retries,
+        )
+        if added["failed"]:
+            key_value, error = next(iter(added["failed"].items()))
+            raise BewardIntercomModuleError(
+                "{} keys of {}-{} not added, {}: {}".format(
+                    len(added["failed"]),
+                    rows[0] + 1,
+                    rows[-1] + 1,
+                    key_value,
+                    error,
+                ),
+            )
+
+    def _missing_rows(self, table, panel_keys):
+        """Строки таблицы, которых нет на панели с теми же параметрами."""
+        index = panel_keys.index
+        format_type = self.format_type
+        return [
+            row
+            for row in range(len(table))
+            if table.uid[row] not in index
+            or table.record(row, format_type)
+            != panel_keys.record(index[table.uid[row]], format_type)
+        ]
+
+    def load_import_checkpoint(self, checkpoint):
+        """Состояние прерванной загрузки upload_keys_chunked.
+
+        Args:
+            checkpoint (str): путь к файлу состояния загрузки.
+
+        Returns:
+            dict: состояние загрузки или None, если файла нет, он относится
+            к другой панели или снимок ключей изменился.
+        """
+        try:
+            with open(checkpoint, "r", encoding="UTF-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if state.get("ip") != self.client.ip:
+            return None
+        try:
+            snapshot = KeyTable(self._iter_snapshot(checkpoint))
+        except OSError:
+            return None
+        if self._fingerprint(snapshot) != state.get("fingerprint"):
+            LOGGER.warning("{}: key snapshot changed, checkpoint ignored.".format(checkpoint))
+            return None
+        return state
+
+    def _verify_import(self, table):
+        """Есть ли все ключи таблицы на панели с теми же параметрами."""
+        panel_keys = self.load_key_table()
+        return not (table - panel_keys) and not table.changed(panel_keys, self.format_type)
+
+    @staticmethod
+    def _fingerprint(table):
+        digest = sha1()
+        for line in table.iter_key_strings("MIFARE"):
+            digest.update(line.encode("utf-8") + b"\n")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _iter_snapshot(checkpoint):
+        with open(checkpoint + ".keys", "r", encoding="UTF-8") as file:
+            for line in file:
+                yield line
+
+    @staticmethod
+    def _save_snapshot(checkpoint, table):
+        """Снимок загружаемых ключей рядом с checkpoint."""
+        with open(checkpoint + ".keys", "w", encoding="UTF-8") as file:
+            for line in table.iter_key_strings("MIFARE"):
+                file.write(line + "\n")
+
+    @staticmethod
+    def _save_import_state(checkpoint, state):
+        # Запись через временный файл, чтобы прерывание не испортило состояние
+        temp_path = checkpoint + ".tmp"
+        with open(temp_path, "w", encoding="UTF-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, checkpoint)
+
     def dump_keys(self, format_type="MIFARE", formatter=JSONDumpFormatter, raw=False):
         """Сохранение ключей.
         Args:
@@ -141,9 +498,9 @@ class RfidModule(BewardIntercomModule):
             try:
                 num += 1
                 if keys_type == "KEYSTRING":
-                    self.__dict__["key_" + str(num)] = Key(key_string=key)
+                    self.keys[str(num)] = Key(key_string=key)
                 elif keys_type == "KEYPARAMS":
-                    self.__dict__["key_" + str(num)] = Key(key_params=key)
+                    self.keys[str(num)] = Key(key_params=key)
             except ValueError as err:
                 LOGGER.warning("Error init key <{}>: {}".format(key, err))
             except TypeError as err:
@@ -175,14 +532,50 @@ class RfidModule(BewardIntercomModule):
                 "Parsing error. Response: {}".format(content["message"]),
             )
 
-    def slow_upload_keys(self):
-        """Загрузка ключей на панель по ключу."""
-        for key, value in self.__dict__.items():
-            if key[:4] == "key_":
+    def slow_upload_keys(self, keys=None, max_workers=1, retries=0, backoff_factor=0.5):
+        """Загрузка ключей на панель по ключу.
+
+        Замена action=import для прошивок, на которых он не работает.
+        Запросы add выполняются через общий клиент модуля, одновременно не
+        больше max_workers. Ошибки ключей не прерывают загрузку остальных.
+
+        Args:
+            keys (Union[KeyTable, Iterable[Key]], optional): ключи. По
+                умолчанию ключи модуля.
+            max_workers (int): количество одновременных запросов.
+            retries (int): количество повторов add для ключа после ошибки.
+            backoff_factor (float): задержка перед повтором, растет как
+                backoff_factor * 2 ** n.
+
+        Returns:
+            dict: succeeded - список UID загруженных ключей, failed -
+            словарь UID и текст ошибки последней попытки.
+        """
+        if keys is None:
+            keys = self.keys.values()
+        keys = list(keys)
+
+        def _add(key):
+            attempt = 0
+            while True:
                 try:
-                    self.add_key(value)
-                except BewardIntercomModuleError as err:
-                    LOGGER.error(str(err))
+                    self.add_key(key)
+                    return None
+                except (BewardIntercomModuleError, RequestException, CircuitOpenError) as err:
+                    if attempt >= retries:
+                        LOGGER.error("Key {}: {}".format(key.param_Key, err))
+                        return err
+                    sleep(backoff_factor * 2 ** attempt)
+                    attempt += 1
+
+        result = {"succeeded": [], "failed": {}}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for key, err in zip(keys, executor.map(_add, keys)):
+                if err is None:
+                    result["succeeded"].append(key.param_Key)
+                else:
+                    result["failed"][key.param_Key] = str(err)
+        return result
 
     def delete_key(self, key_value=None, apartment=None, key_index=None):
         """Удаление ключей.
@@ -214,12 +607,13 @@ class RfidModule(BewardIntercomModule):
                 "Parsing error. Response: {}".format(content["message"]),
             )
 
-    def update_key(self, update_key):
+    def update_key(self, update_key, reload=True):
 
         """Обновление параметров ключа
 
         Args:
             update_key (Key): обновленный ключ
+            reload (bool): перечитать ключи модуля с панели после обновления.
         """
         params = update_key.get_params(self.format_type)
         params.update({"action": "update"})
@@ -237,7 +631,88 @@ class RfidModule(BewardIntercomModule):
             raise BewardIntercomModuleError(
                 "Parsing error. Response: {}".format(content["message"]),
             )
-        self.load_keys_from_panel()
+        if reload:
+            self.load_keys_from_panel()
+
+    def sync_keys(
+        self,
+        keys=None,
+        delete=True,
+        threshold=None,
+        chunk_size=None,
+        checkpoint=None,
+        max_workers=1,
+    ):
+        """Синхронизация базы ключей панели с минимумом изменений.
+
+        Ключи сравниваются с выгрузкой панели по UID: отсутствующие на панели
+        добавляются, ключи с другими параметрами обновляются, лишние
+        удаляются. Если изменений не больше threshold, они отправляются
+        запросами add/update/delete по ключу, иначе база загружается
+        целиком через action=import.
+
+        Args:
+            keys (Union[KeyTable, Iterable[str]], optional): нужные ключи
+                таблицей или строками. По умолчанию ключи модуля.
+            delete (bool): удалять ключи панели, которых нет в keys. Если
+                False, ключи панели сохраняются.
+            threshold (int, optional): граница между запросами по ключу и
+                загрузкой базы. По умолчанию sync_threshold.
+            chunk_size (int, optional): загружать базу частями через
+                upload_keys_chunked по chunk_size ключей.
+            checkpoint (str, optional): файл состояния загрузки частями.
+            max_workers (int): количество одновременных запросов add при
+                продолжении загрузки частями.
+
+        Returns:
+            dict: количество добавленных (added), обновленных (updated) и
+            удаленных (deleted) ключей и способ загрузки (mode): "none",
+            "keys" или "import".
+        """
+        if keys is None:
+            keys = self.get_key_table()
+        elif not isinstance(keys, KeyTable):
+            keys = KeyTable(keys)
+        if threshold is None:
+            threshold = self.sync_threshold
+
+        panel_keys = self.load_key_table()
+        added = keys - panel_keys
+        updated = keys.changed(panel_keys, self.format_type)
+        deleted = panel_keys - keys if delete else KeyTable()
+        result = {
+            "added": len(added),
+            "updated": len(updated),
+            "deleted": len(deleted),
+            "mode": "none",
+        }
+        changes = len(added) + len(updated) + len(deleted)
+        if not changes:
+            return result
+
+        if changes > threshold:
+            # Ключи панели, которые не удаляются, загружаются вместе с keys
+            table = keys if delete else keys | panel_keys
+            if chunk_size:
+                self.upload_keys_chunked(
+                    table,
+                    chunk_size,
+                    checkpoint,
+                    max_workers=max_workers,
+                )
+            else:
+                self._import_keys(self.make_keys_payload(table))
+            result["mode"] = "import"
+            return result
+
+        for row in range(len(deleted)):
+            self.delete_key(key_value=deleted.get_uid(row))
+        for key in added:
+            self.add_key(key)
+        for key in updated:
+            self.update_key(key, reload=False)
+        result["mode"] = "keys"
+        return result
 
     def get_dump(self, formatter=JSONDumpFormatter, raw=False):
         """Сохранение параметров модуля.
@@ -262,17 +737,7 @@ class RfidModule(BewardIntercomModule):
             config(dict): конфигурация панели.
 
         """
-        module_config = config.get(self.__str__(), None)
-        if module_config is None:
-            raise BewardIntercomModuleError("Module config not found.")
-
-        for key, value in module_config.items():
-            check_param = self.__dict__.get("param_" + key, None)
-            if check_param is None:
-                LOGGER.error("Param %s not found.", key)
-                continue
-            self.__dict__["param_" + key] = value
-            LOGGER.debug("Param %s set to %s.", key, value)
+        super(RfidModule, self).set_dump(config)
         keys = config.get("Keys", None)
         self.loads_keys(keys)
         return True
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 # coding=utf8
 from .general.client import Client
+from .general.pool import SESSION_POOL
 
 """Полезные скрипты для взаимодествия с панелями
 """
@@ -16,7 +17,7 @@ def check_credentials(ip=None, login=None, password=None):
     """
     if any([ip is None, login is None, password is None]):
         raise ValueError("Invalid ip or login or password")
-    client = Client(ip=ip, login=login, password=password)
+    client = Client(ip=ip, login=login, password=password, pool=SESSION_POOL)
     status = client.check_credentials()
     client.close()
     return status
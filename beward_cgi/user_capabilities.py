@@ -43,11 +43,11 @@ class UserCapabilitiesModule(BewardIntercomModule):
                 continue
 
             try:
-                self.__dict__["param_" + str(key)] = Capabilities(
-                    str(value),
-                )
+                self.params[str(key)] = Capabilities(str(value))
             except UnicodeEncodeError:
-                self.__dict__["param_" + str(key)] = Capabilities(value)
+                self.params[str(key)] = Capabilities(value)
+
+        self._mark_loaded(self.get_params(True))
 
     def update_params(self, update=None, *args, **kwargs):
         """Обновление параметров модуля.
@@ -64,20 +64,24 @@ class UserCapabilitiesModule(BewardIntercomModule):
         if update is None:
             update = {}
         for key, value in update.items():
-            item = self.__dict__.get("param_" + key, None)
+            item = self.params.get(key)
 
             if item is None:
                 continue
 
             if isinstance(value, dict):
-                self.__dict__["param_" + key].update_params(update=value)
+                item.update_params(update=value)
 
         return True
 
     def set_params(self):
-        """Метод загрузки параметров на панель панели."""
+        """Метод загрузки параметров на панель панели.
+
+        Права отправляются только для пользователей, у которых они
+        изменились после load_params.
+        """
 
-        all_user_params = self.get_params(True)
+        all_user_params = self.get_changed_params(self.get_params(True))
 
         for key, value in all_user_params.items():
             params = {"action": "update"}
@@ -89,21 +93,16 @@ class UserCapabilitiesModule(BewardIntercomModule):
                 raise BewardIntercomModuleError("Error, %s" % response.status_code)
 
             LOGGER.debug("", response)
+            if self._loaded_params is not None:
+                self._loaded_params[key] = value
 
         return True
 
     def get_params(self, key_string=False):
         """Получить параметры с панели."""
-        params = {}
-        for key, value in self.__dict__.items():
-            if "param_" == key[:6]:
-                key = key.replace("param_", "")
-                if key_string:
-                    params.update({key: value.get_key_string()})
-                else:
-                    params.update({key: value.get_params(False)})
-
-        return params
+        if key_string:
+            return {key: value.get_key_string() for key, value in self.params.items()}
+        return {key: value.get_params(False) for key, value in self.params.items()}
 
     def __str__(self):
         return "UserCapabilitiesModule"
@@ -119,10 +118,9 @@ class UserCapabilitiesModule(BewardIntercomModule):
             raise BewardIntercomModuleError("Module config not found.")
 
         for key, value in module_config.items():
-            check_param = self.__dict__.get("param_" + key, None)
-            if check_param is None:
+            if key not in self.params:
                 LOGGER.error("Param %s not found.", key)
                 continue
-            self.__dict__["param_" + key] = Capabilities(capabilities_params=value)
+            self.params[key] = Capabilities(capabilities_params=value)
             LOGGER.debug("Param %s set to %s.", key, value)
         return True
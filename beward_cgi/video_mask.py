@@ -40,9 +40,11 @@ class VideoMaskModule(BewardIntercomModule):
                 continue
 
             try:
-                self.__dict__["param_" + str(key)] = str(value)
+                self.params[str(key)] = str(value)
             except UnicodeEncodeError:
-                self.__dict__["param_" + str(key)] = value
+                self.params[str(key)] = value
+
+        self._mark_loaded()
 
     def __str__(self):
         return "VideoMaskModule"
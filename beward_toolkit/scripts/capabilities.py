@@ -8,7 +8,7 @@ if str(Path(__file__).resolve().parent.parent) not in path:
 if str(Path(__file__).resolve().parent.parent.parent) not in path:
     path.append(str(Path(__file__).resolve().parent.parent.parent))
 
-from general_solutions import get_reachable_hosts, ping, run_command_to_seqens
+from general_solutions import get_reachable_hosts, iter_command_to_seqens, ping
 
 from beward_cgi.user_capabilities import UserCapabilitiesModule
 from beward_toolkit.scripts.credentials import check_or_brut_admin_credentials
@@ -79,19 +79,22 @@ def get_capabilites_hosts(hosts=None, username=None, password=None, thread_num=1
     """
     output = []
     if hosts is not None:
+        reachable_hosts = []
         for host in hosts:
             if not ping(host):
                 output.append(({"ip": host}, {"Error": "UNREACHABLE"}))
-                output.remove(host)
+                continue
+            reachable_hosts.append(host)
+        hosts = reachable_hosts
     else:
         hosts = get_reachable_hosts()
-    seqens = [(host, username, password) for host in hosts]
-    output += run_command_to_seqens(
+    seqens = ((host, username, password) for host in hosts)
+    output.extend(iter_command_to_seqens(
         get_capabilites,
         seqens,
         ("ip", "username", "password"),
         thread_num,
-    )
+    ))
     return output
 
 
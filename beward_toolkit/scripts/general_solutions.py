@@ -1,12 +1,17 @@
 #!/usr/bin/python
 # coding=utf8
+import asyncio
 import os
+import socket
+import struct
 from re import findall, match
 from csv import DictReader
 from platform import system
 from subprocess import DEVNULL, call
-from threading import Thread, active_count
-from time import sleep, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import time
 from pathlib import Path
 from sys import path
 from zipfile import ZipFile, BadZipFile
@@ -20,6 +25,11 @@ if str(Path(__file__).resolve().parent.parent.parent) not in path:
 
 from config.settings import HOSTS
 
+# Параметры проверки доступности устройств
+SCAN_PORT = 80
+SCAN_TIMEOUT = 1.0
+SCAN_CONCURRENCY = 512
+
 
 def threading_decorator(thread_num):
     def actual_decorator(func):
@@ -61,6 +71,161 @@ def threading_decorator(thread_num):
     return actual_decorator
 
 
+class CommandExecutor(object):
+    """Ограниченный пул потоков для выполнения команды над последовательностью.
+
+    Задачи берутся из последовательности лениво: в работе находится не больше
+    `thread_num * 2` задач, поэтому генераторы хостов можно передавать без
+    предварительного построения списка. Результаты отдаются по мере
+    завершения, выполнение можно отменить методом cancel.
+
+    Example:
+        >>> with CommandExecutor(thread_num=10) as executor:
+        ...     for input_args, output in executor.run(ping, hosts, ("host",)):
+        ...         print(input_args, output)
+    """
+
+    def __init__(self, thread_num=1):
+        """Инициализация пула.
+
+        Args:
+            thread_num (int, optional): Количество потоков. По умолчанию 1.
+        """
+        self.thread_num = max(1, int(thread_num or 1))
+        self._executor = ThreadPoolExecutor(max_workers=self.thread_num)
+        self._cancelled = Event()
+        self._pending = set()
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    @property
+    def cancelled(self):
+        """Была ли отменена работа пула."""
+        return self._cancelled.is_set()
+
+    @staticmethod
+    def _call(command, input_args):
+        """Выполнение команды с перехватом ошибки.
+
+        Returns:
+            tuple: кортеж входных аргументов и результата.
+        """
+        try:
+            output = command(**input_args)
+        except Exception as err:
+            print("Error %s for input %s" % (str(err), input_args))
+            output = {"Error": str(err)}
+        return (input_args, output)
+
+    def submit(self, command, input_args):
+        """Поставить команду в очередь пула.
+
+        Args:
+            command (callable): Команда для выполнения.
+            input_args (dict): Именованные аргументы команды.
+
+        Returns:
+            Future: будущий результат (input_args, output).
+        """
+        future = self._executor.submit(self._call, command, input_args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def run(self, command, seqens, iteration_kwargs_names=()):
+        """Выполняет команду для каждого элемента последовательности.
+
+        Args:
+            command (callable): Команда для выполнения.
+            seqens (Iterable): Последовательность аргументов.
+            iteration_kwargs_names (tuple, optional): Имена аргументов для команды.
+
+        Yields:
+            tuple: кортеж входных аргументов и результата по мере завершения.
+        """
+        seqens = iter(seqens)
+        window = self.thread_num * 2
+        running = set()
+        exhausted = False
+
+        try:
+            while running or not exhausted:
+                while not exhausted and not self.cancelled and len(running) < window:
+                    try:
+                        args = next(seqens)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if not hasattr(args, "__iter__") or isinstance(args, str):
+                        args = (args,)
+                    input_args = dict(zip(iteration_kwargs_names, args))
+                    running.add(self.submit(command, input_args))
+
+                if self.cancelled:
+                    exhausted = True
+                    for future in running:
+                        future.cancel()
+                if not running:
+                    break
+
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if not future.cancelled():
+                        yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+    def cancel(self):
+        """Отмена всех задач, которые еще не начали выполняться."""
+        self._cancelled.set()
+        with self._lock:
+            pending = tuple(self._pending)
+        for future in pending:
+            future.cancel()
+
+    def shutdown(self, wait=True):
+        """Остановка пула потоков."""
+        self._executor.shutdown(wait=wait)
+
+
+def iter_command_to_seqens(
+    command,
+    seqens,
+    iteration_kwargs_names=(),
+    thread_num=1,
+):
+    """Выполняет команду для последовательности аргументов и отдает результаты
+    по мере их готовности.
+
+    Args:
+        command (callable): Команда для выполнения.
+        seqens (Iterable): Последовательность аргументов.
+        iteration_kwargs_names (tuple, optional): Имена аргументов для команды.
+        thread_num (int, optional): Количество потоков. По умолчанию 1.
+
+    Yields:
+        tuple: кортеж входных аргументов и результата.
+    """
+    with CommandExecutor(thread_num) as executor:
+        try:
+            for result in executor.run(command, seqens, iteration_kwargs_names):
+                yield result
+        except GeneratorExit:
+            executor.cancel()
+            raise
+
+
 def run_command_to_seqens(
     command,
     seqens,
@@ -74,7 +239,7 @@ def run_command_to_seqens(
 
     Args:
         command (callable): Команда для выполнения.
-        seqens (tuple): Последовательность аргументов.
+        seqens (Iterable): Последовательность аргументов.
         iteration_kwargs_names (tuple, optional): Имена аргументов для команды.
         thread_num (int, optional): Количество потоков. По умолчанию 1.
 
@@ -82,34 +247,25 @@ def run_command_to_seqens(
         list: Список с кортежами входных аргументов и результатов.
 
     """
-    general_output = []
-    seqens = list(seqens)
+    return list(
+        iter_command_to_seqens(command, seqens, iteration_kwargs_names, thread_num),
+    )
 
-    @threading_decorator(thread_num)
-    def _run_command():
-        """Запускает функцию команды в нескольких потоках.
 
-        Эта функция декорирована с помощью `threading_decorator` для достижения параллельного выполнения.
-        Каждый поток берет аргумент из последовательности `seqens`, создает словарь входных аргументов,
-        выполняет команду и добавляет входные аргументы и результат в список `general_output`.
+def split_host_port(host, port=SCAN_PORT):
+    """Разделение адреса вида ip:port.
 
-        """
-        while len(seqens) > 0:
-            args = seqens.pop(0)
-            if not hasattr(args, "__iter__") or isinstance(args, str):
-                args = (args,)
-            input_args = dict(zip(iteration_kwargs_names, args))
-            try:
-                output = command(**input_args)
-            except Exception as err:
-                print("Error %s for input %s" % (str(err), input_args))
-                output = {"Error": str(err)}
-            general_output.append((input_args, output))
+    Args:
+        host (str): адрес устройства, порт указывать не обязательно.
+        port (int): порт, если он не указан в адресе.
 
-    _run_command()
-    while active_count() > 1:
-        sleep(1)
-    return general_output
+    Returns:
+        tuple: (адрес, порт)
+    """
+    address, separator, host_port = str(host).rpartition(":")
+    if separator and host_port.isdigit() and ":" not in address:
+        return address, int(host_port)
+    return str(host), port
 
 
 def ping(host):
@@ -117,31 +273,279 @@ def ping(host):
     Функция проверяет доступность удаленного устройства.
 
     Args:
-        host: устройство для проверки.
+        host: устройство для проверки, порт в адресе ip:port не учитывается.
     Returns True если устройство доступено, иначе False.
     """
     param = "-n" if system().lower() == "windows" else "-c"
-    command = ["ping", param, "1", host]
+    command = ["ping", param, "1", split_host_port(host)[0]]
     return call(command, stdout=DEVNULL) == 0
 
 
-def get_reachable_hosts():
-    """Получение списка доступных устройств."""
-    reachable_hosts = []
-    hosts = HOSTS[:]
+class _IcmpProber(object):
+    """Эхо-запросы ICMP через один неблокирующий сокет на весь обход.
+
+    Сначала пробуется datagram сокет (Linux, net.ipv4.ping_group_range),
+    затем raw сокет (нужны права администратора). Если ни один не доступен,
+    конструктор выбрасывает OSError.
 
-    @threading_decorator(700)
-    def _run_command():
-        while len(hosts) > 0:
-            ip = hosts.pop(0)
-            ip = str(ip)
-            if ping(ip):
-                reachable_hosts.append(ip)
+    Ответы сопоставляются с запросами по адресу и номеру запроса, поэтому
+    одновременные проверки одного адреса не мешают друг другу.
+    """
+
+    def __init__(self, loop):
+        try:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
+                                       socket.IPPROTO_ICMP)
+            self._raw = False
+        except OSError:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_RAW,
+                                       socket.IPPROTO_ICMP)
+            self._raw = True
+        self._sock.setblocking(False)
+        self._loop = loop
+        self._waiters = {}
+        self._sequence = 0
+        self._identifier = os.getpid() & 0xFFFF
+        loop.add_reader(self._sock.fileno(), self._on_read)
+
+    @staticmethod
+    def _checksum(data):
+        if len(data) % 2:
+            data += b"\x00"
+        total = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+        total = (total >> 16) + (total & 0xFFFF)
+        total += total >> 16
+        return ~total & 0xFFFF
+
+    def _next_sequence(self, host):
+        # Номер, свободный для этого адреса, даже после переполнения счетчика
+        for _ in range(0x10000):
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            if (host, self._sequence) not in self._waiters:
+                return self._sequence
+        raise OSError("No free ICMP sequence for {}".format(host))
+
+    def _packet(self, sequence):
+        header = struct.pack("!BBHHH", 8, 0, 0, self._identifier, sequence)
+        payload = b"beward"
+        checksum = self._checksum(header + payload)
+        header = struct.pack("!BBHHH", 8, 0, checksum, self._identifier, sequence)
+        return header + payload
+
+    def _on_read(self):
+        while True:
+            try:
+                data, address = self._sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if self._raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            # Тип 0 - эхо-ответ
+            if len(data) < 8 or data[0] != 0:
+                continue
+            identifier, sequence = struct.unpack("!HH", data[4:8])
+            # Datagram сокет подменяет идентификатор и получает только свои ответы
+            if self._raw and identifier != self._identifier:
+                continue
+            waiter = self._waiters.get((address[0], sequence))
+            if waiter is not None and not waiter.done():
+                waiter.set_result(True)
+
+    async def probe(self, host, timeout):
+        waiter = self._loop.create_future()
+        key = None
+        try:
+            key = (host, self._next_sequence(host))
+            self._waiters[key] = waiter
+            self._sock.sendto(self._packet(key[1]), (host, 0))
+            return await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return False
+        finally:
+            if self._waiters.get(key) is waiter:
+                del self._waiters[key]
+
+    def close(self):
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+
+
+async def _tcp_probe(host, port, timeout):
+    """Проверка доступности порта устройства через TCP-подключение."""
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port),
+            timeout,
+        )
+    except (asyncio.TimeoutError, OSError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
 
-    _run_command()
-    while active_count() > 1:
-        sleep(1)
-    return reachable_hosts
+
+async def probe_hosts(hosts, port=SCAN_PORT, timeout=SCAN_TIMEOUT,
+                      concurrency=SCAN_CONCURRENCY, method="icmp"):
+    """Асинхронная проверка доступности устройств.
+
+    Args:
+        hosts (Iterable): адреса устройств, читаются лениво.
+        port (int): порт для TCP проверки. По умолчанию HTTP порт панели.
+            Порт в адресе вида ip:port имеет приоритет.
+        timeout (float): время ожидания ответа одного устройства в секундах.
+        concurrency (int): максимальное количество одновременных проверок.
+        method (str): "icmp" - эхо-запрос, как ping, "tcp" - подключение
+            к порту. По умолчанию "icmp". Если ICMP сокет недоступен,
+            используется TCP.
+
+    Yields:
+        tuple: (адрес, доступность) в порядке получения ответов.
+    """
+    loop = asyncio.get_running_loop()
+    prober = None
+    if method == "icmp":
+        try:
+            prober = _IcmpProber(loop)
+        except OSError as err:
+            print("ICMP is unavailable ({}), checking TCP port instead".format(err))
+            prober = None
+
+    def _probe(host):
+        address, host_port = split_host_port(host, port)
+        if prober is not None:
+            return prober.probe(address, timeout)
+        return _tcp_probe(address, host_port, timeout)
+
+    hosts = iter(hosts)
+    concurrency = max(1, int(concurrency))
+    running = {}
+    exhausted = False
+
+    try:
+        while running or not exhausted:
+            while not exhausted and len(running) < concurrency:
+                try:
+                    host = str(next(hosts))
+                except StopIteration:
+                    exhausted = True
+                    break
+                running[asyncio.ensure_future(_probe(host))] = host
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield running.pop(task), task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        if prober is not None:
+            prober.close()
+
+
+async def scan_hosts(hosts, **kwargs):
+    """Асинхронный поток доступных устройств.
+
+    Args:
+        hosts (Iterable): адреса устройств.
+        kwargs: параметры probe_hosts.
+
+    Yields:
+        str: адрес доступного устройства.
+    """
+    async for host, reachable in probe_hosts(hosts, **kwargs):
+        if reachable:
+            yield host
+
+
+def iter_probe_hosts(hosts, **kwargs):
+    """Синхронная обертка над probe_hosts.
+
+    Event loop работает в отдельном потоке, результаты передаются через
+    очередь, поэтому их можно обрабатывать до окончания обхода. Если
+    генератор закрыт до окончания обхода, обход отменяется.
+
+    Args:
+        hosts (Iterable): адреса устройств.
+        kwargs: параметры probe_hosts.
+
+    Yields:
+        tuple: (адрес, доступность) в порядке получения ответов.
+    """
+    results = Queue()
+    finished = object()
+    stop = Event()
+    lock = Lock()
+    # Event loop и задача обхода для отмены из потока потребителя
+    running = []
+
+    async def _produce():
+        with lock:
+            if stop.is_set():
+                return
+            running.append((asyncio.get_running_loop(), asyncio.current_task()))
+        async for item in probe_hosts(hosts, **kwargs):
+            results.put(item)
+
+    def _run():
+        try:
+            asyncio.run(_produce())
+        except asyncio.CancelledError:
+            pass
+        except BaseException as err:
+            results.put(err)
+        results.put(finished)
+
+    thread = Thread(target=_run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        with lock:
+            stop.set()
+            for loop, task in running:
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # Обход уже завершен и event loop закрыт
+                    pass
+        thread.join()
+
+
+def iter_reachable_hosts(hosts=None, **kwargs):
+    """Поток доступных устройств.
+
+    Args:
+        hosts (Iterable, optional): адреса устройств. По умолчанию HOSTS.
+        kwargs: параметры probe_hosts.
+
+    Yields:
+        str: адрес доступного устройства.
+    """
+    if hosts is None:
+        hosts = HOSTS
+    for host, reachable in iter_probe_hosts(hosts, **kwargs):
+        if reachable:
+            yield host
+
+
+def get_reachable_hosts(**kwargs):
+    """Получение списка доступных устройств.
+
+    Args:
+        kwargs: параметры probe_hosts (port, timeout, concurrency, method).
+    """
+    return list(iter_reachable_hosts(HOSTS, **kwargs))
 
 
 def get_cmd_window_size():
@@ -332,7 +736,8 @@ def is_valid_ipv4(address):
     return bool(match(ip_pattern, address))
 
 
-def process_host_arguments(func, hosts, func_kwargs, kwargs_seqens, thread):
+def process_host_arguments(func, hosts, func_kwargs, kwargs_seqens, thread,
+                           **scan_kwargs):
     """
     Обрабатывает список хостов и выполняет функцию на каждом хосте.
 
@@ -342,43 +747,49 @@ def process_host_arguments(func, hosts, func_kwargs, kwargs_seqens, thread):
         func_kwargs (dict): Словарь ключевых аргументов, передаваемых функции.
         kwargs_seqens (list): Список строк, представляющих ключи ключевых аргументов функции, которые должны быть включены в последовательность для каждого хоста.
         thread (int): Количество потоков для параллельного выполнения функции на каждом хосте.
+        scan_kwargs (dict): Параметры проверки доступности для probe_hosts (port, timeout, concurrency, method).
 
     Примечание:
         - Функция ожидает, что каждый хост будет представлен либо в виде словаря, либо в виде строки.
         - Если хост является словарем, он должен иметь ключи "IP" и "Name".
         - Если хост является строкой, предполагается, что это IP-адрес, и имя устанавливается как пустая строка.
-        - Функция проверяет доступность хоста, выполняя пинг по его IP-адресу.
-        - Если хост недоступен, он пропускается.
-        - Функция изменяет словарь func_kwargs, добавляя IP-адрес каждого хоста.
-        - Список seqens хранит последовательность значений ключевых аргументов функции для каждого хоста.
-        - Функция вызывает функцию run_command_to_seqens для выполнения функции на каждом хосте с указанными ключевыми аргументами и количеством потоков.
-        - Результатом функции является список результатов, возвращаемых функцией run_command_to_seqens.
+        - Доступность всех хостов проверяется одновременно асинхронным сканером.
+        - Хост передается в пул потоков run_command_to_seqens сразу после ответа.
+        - Недоступный хост попадает в результат с выводом {"Error": "UNREACHABLE"}.
+        - Для каждого хоста создается копия func_kwargs с его IP-адресом.
+        - Результатом функции является список кортежей входных аргументов и результатов.
     """
-    output = []
-    seqens = []
-
+    ips = []
     for item in hosts:
         if isinstance(item, dict):
             ip = item.get("IP", "")
-            name = item.get("Name", "")
         elif isinstance(item, str):
-            name = ''
             ip = item
         else:
-            ValueError("Host must be str or dict")
+            raise ValueError("Host must be str or dict")
         if ip is None:
             continue
-        if not ping(ip):
-            continue
-        func_kwargs['ip'] = ip
-        host_seqens = [func_kwargs[key] for key in kwargs_seqens]
-        seqens.append(host_seqens)
-        
-    output += run_command_to_seqens(
+        ips.append(ip)
+
+    def _host_seqens(ip):
+        host_kwargs = dict(func_kwargs, ip=ip)
+        return [host_kwargs[key] for key in kwargs_seqens]
+
+    unreachable = []
+
+    def _iter_seqens():
+        for ip, reachable in iter_probe_hosts(ips, **scan_kwargs):
+            if reachable:
+                yield _host_seqens(ip)
+                continue
+            print("Host %s is unreachable" % ip)
+            input_args = dict(zip(kwargs_seqens, _host_seqens(ip)))
+            unreachable.append((input_args, {"Error": "UNREACHABLE"}))
+
+    output = run_command_to_seqens(
         func,
-        seqens,
+        _iter_seqens(),
         kwargs_seqens,
         thread,
     )
-
-    return output
+    return output + unreachable
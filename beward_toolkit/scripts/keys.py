@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 # coding=utf8
 import argparse
+import mmap
+import os
+import re
 from os.path import isfile
-from re import match
 from pathlib import Path
 from sys import path
 from json import load, dump, loads
@@ -16,7 +18,10 @@ if str(Path(__file__).resolve().parent.parent.parent) not in path:
 from beward_cgi.rfid import RfidModule
 from beward_cgi.mifare import MifareModule
 from beward_cgi.beward_key import Key
+from beward_cgi.key_table import KeyTable
 from beward_cgi.general.client import BewardClient
+from beward_cgi.general.cache import IN_FLIGHT, RESPONSE_CACHE
+from beward_cgi.general.pool import SESSION_POOL
 from beward_toolkit.scripts.credentials import check_or_brut_admin_credentials
 from beward_cgi.general.module import BewardIntercomModuleError
 from interface import get_epiloge_message
@@ -34,6 +39,7 @@ RFID или MIFARE. Он позволяет выполнять загрузку
 с ключами в многопоточном режиме.
 
 Функции:
+- open_keysfile: Потоково читает файл с ключами EQM и определяет формат ключей.
 - format_keysfile_to_keystring_array: Конвертирует данные из файла с ключами EQM в массив ключей.
 - create_key_module_based_on_panel_type: Создает модуль для работы с ключами в зависимости от типа панели.
 - upload_keys_from_eqm_file: Загружает ключи на панель из файла формата EQM.
@@ -90,6 +96,113 @@ MODULE_VERSION = "1.3"
 LAST_UPDATE = "29.11.2023"
 
 
+# Строка файла EQM: имя параметра с номером ключа и значение
+EQM_LINE_PATTERN = re.compile(rb"^[A-z]+([0-9]+)=(.*?)\r?$", re.MULTILINE)
+# Номер ключа строки файла EQM
+EQM_INDEX_PATTERN = re.compile(rb"^[A-z]+([0-9]+)=", re.MULTILINE)
+# Значения флагов EQM в формате ключей панели
+EQM_FLAGS = {"off": "0", "on": "1"}
+
+
+def _is_keysfile_contiguous(keys_file):
+    """Параметры каждого ключа идут подряд, номера ключей возрастают."""
+    last = -1
+    current = None
+    for match_result in EQM_INDEX_PATTERN.finditer(keys_file):
+        key_index = match_result.group(1)
+        if key_index != current:
+            number = int(key_index)
+            if number <= last:
+                return False
+            last, current = number, key_index
+    return True
+
+
+def _iter_keysfile_records(filepath):
+    """
+    Значения параметров ключей файла EQM по одному ключу.
+
+    Файл отображается в память через mmap и читается в два прохода.
+    Первый проход только по номерам ключей проверяет, что параметры
+    каждого ключа идут подряд с возрастающими номерами, как их сохраняет
+    EQM. Без этой проверки ключ нельзя отдать до конца файла: его
+    параметры могут встретиться ниже. Проверка занимает около 40%
+    времени разбора, данные при этом читаются с диска один раз.
+
+    Для такого файла второй проход отдает ключи по мере разбора, и память
+    не зависит от размера файла. Иначе второй проход группирует значения
+    всех ключей в словаре по номеру ключа, память растет с размером
+    файла, ключи отдаются в порядке первого появления.
+
+    Yields:
+        list: значения параметров ключа в порядке файла.
+
+    Raises:
+        UnicodeDecodeError: если значение параметра не в UTF-8.
+    """
+    with open(filepath, "rb") as file:
+        if not os.fstat(file.fileno()).st_size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as keys_file:
+            if not _is_keysfile_contiguous(keys_file):
+                print("Параметры ключей в файле %s идут не по порядку" % filepath)
+                keys = {}
+                for match_result in EQM_LINE_PATTERN.finditer(keys_file):
+                    keys.setdefault(match_result.group(1), []).append(
+                        match_result.group(2).decode("UTF-8"),
+                    )
+                for values in keys.values():
+                    yield values
+                return
+
+            key_index = None
+            values = []
+            for match_result in EQM_LINE_PATTERN.finditer(keys_file):
+                if match_result.group(1) != key_index:
+                    if values:
+                        yield values
+                    key_index = match_result.group(1)
+                    values = []
+                values.append(match_result.group(2).decode("UTF-8"))
+            if values:
+                yield values
+
+
+def open_keysfile(filepath):
+    """
+    Потоковое чтение файла с ключами из EQM.
+
+    Формат ключей определяется по первому ключу файла, остальные ключи
+    читаются по мере обхода генератора.
+
+    Args:
+        filepath (str): Путь к файлу
+
+    Raises:
+        ValueError: Если в файла не существует;
+
+    Returns:
+        tuple: Генератор строк ключей и формат (тип) ключей, None для
+        файла без ключей.
+    """
+    if not isfile(filepath):
+        raise ValueError("File not found!")
+
+    records = _iter_keysfile_records(filepath)
+    first = next(records, None)
+    if first is None:
+        return iter(()), None
+    format_type = 'MIFARE' if len(first) > 3 else 'RFID'
+
+    def keystrings():
+        # Параметр KeyIndex или Index срезается
+        yield ','.join(EQM_FLAGS.get(value, value) for value in first[:-1])
+        for values in records:
+            yield ','.join(EQM_FLAGS.get(value, value) for value in values[:-1])
+
+    return keystrings(), format_type
+
+
 def format_keysfile_to_keystring_array(filepath):
     """
     Функция конвертирования данных из файла с ключами из EQM
@@ -119,37 +232,8 @@ def format_keysfile_to_keystring_array(filepath):
         
         # Параметр KeyIndex или Index срезается 
     """
-    # Регулярное выражение для выделения ключа и параметров из файла
-    match_string = r'[A-z]+([0-9]+)=(.*)'
-
-    # Валидация аргументов
-    if not isfile(filepath):
-        raise ValueError("File not found!")
-
-    # Переменные
-    filepath = Path(filepath)
-
-    with open(filepath, 'r') as file:
-        keys_file = file.read().splitlines()
-        keys = {}
-        keystring_array = []
-        format_type = None
-
-        for line in keys_file:
-            match_result = match(match_string, line)
-
-            if match_result:
-                key_index = match_result.group(1)
-                key_value = match_result.group(2)
-                keys.setdefault(key_index, []).append(key_value)
-
-        for val in keys.values():
-            keystring_array.append(
-                ','.join(val[:-1]).replace("off", "0").replace("on", "1")
-            )
-        format_type = 'MIFARE' if len(keys[tuple(keys)[0]]) > 3 else 'RFID'
-
-        return tuple(keystring_array), format_type
+    keystrings, format_type = open_keysfile(filepath)
+    return tuple(keystrings), format_type
 
 
 def create_key_module_based_on_panel_type(
@@ -180,7 +264,8 @@ def create_key_module_based_on_panel_type(
     # Переменные
     if username is None or password is None:
         username, password = check_or_brut_admin_credentials(ip, username, password)
-    client = BewardClient(ip=ip, login=username, password=password)
+    client = BewardClient(ip=ip, login=username, password=password, pool=SESSION_POOL,
+                          cache=RESPONSE_CACHE, flights=IN_FLIGHT)
 
     def _create_module(module_cls):
         module = module_cls(client=client, ip=ip, login=username, password=password)
@@ -204,7 +289,8 @@ def _load_keys(filepath, filetype):
         filetype (str): Тип файла: "JSON" или "CONF".
 
     Returns:
-        List[str]: Список загруженных ключей.
+        Union[List[str], KeyTable]: Список загруженных ключей, для типа
+        "CONF" - таблица ключей, разобранная из файла за один проход.
 
     Raises:
         ValueError: Если файл не найден или JSON файл содержит некорректные ключи.
@@ -234,10 +320,10 @@ def _load_keys(filepath, filetype):
             raise ValueError("File not found!")
 
         print("Загрузка файла с ключами из %s" % filepath)
-        keys, _ = format_keysfile_to_keystring_array(filepath)
         try:
-            print("Форматирование файла ключей в массив ключей")
-            keys, _ = format_keysfile_to_keystring_array(filepath)
+            keystrings, _ = open_keysfile(filepath)
+            # Файл разбирается здесь, чтобы ошибки разбора обработались
+            keys = KeyTable(keystrings)
         except:
             print("Ошибка формирования списка ключей из файла %s" % filepath)
             return False
@@ -249,6 +335,11 @@ def _load_keys(filepath, filetype):
     return keys
 
 
+def _get_checkpoint_path(checkpoint_dir, command, ip):
+    """Путь к файлу состояния загрузки ключей частями для панели."""
+    return str(Path(checkpoint_dir or ".") / "keys-{}-{}.json".format(command, ip.replace(":", "_")))
+
+
 def upload_keys_from_eqm_file(
     ip=None,
     username=None,
@@ -256,11 +347,18 @@ def upload_keys_from_eqm_file(
     filepath=None,
     keys = None,
     func="host",
+    sync_threshold=None,
+    chunk_size=None,
+    checkpoint_dir=None,
+    workers=None,
     **kwargs
 ):
     """
     Загрузка ключей на панель из файлов формата системы EQM
 
+    Ключи из файла добавляются к ключам панели: на панель отправляются
+    только новые и измененные ключи, ключи панели не удаляются.
+
     Args:
         ip (str): IP адрес панели. Обязательный аргумент.
         username (str): Имя пользователя. По умолчанию None.
@@ -268,6 +366,16 @@ def upload_keys_from_eqm_file(
         filepath (str): Путь к файлу. По умолчанию None.
         keys (list): Сформированный список ключей. По умолчанию None.
         func (str): режим работы доступны host | string | list. По умолчанию "host".
+        sync_threshold (int): количество изменений, до которого ключи
+            отправляются по одному, иначе база загружается целиком.
+            По умолчанию RfidModule.sync_threshold.
+        chunk_size (int): если указан, база загружается частями по
+            chunk_size ключей с проверкой каждой части, прерванная загрузка
+            продолжается при следующем запуске. По умолчанию None.
+        checkpoint_dir (str): каталог файлов состояния загрузки частями.
+            По умолчанию текущий каталог.
+        workers (int): количество потоков добавления ключей по одному при
+            продолжении загрузки частями. По умолчанию 1.
         kwargs (dict): оставшиеся аргументы режимов работ
 
     Returns:
@@ -282,12 +390,20 @@ def upload_keys_from_eqm_file(
 
     if not keys:
         keys = _load_keys(filepath, "CONF")
+        if keys is False:
+            return False
+    if not isinstance(keys, KeyTable):
+        keys = KeyTable(keys)
 
     if func in ("string", "list"):
         output = process_host_arguments(upload_keys_from_eqm_file,
                                         kwargs.get("csvpath", kwargs.get("string")),
-                                        {"ip": "", "username": username, "password": password, "keys": keys, "func": "host"},
-                                        ("ip", "username", "password", "keys", "func"),
+                                        {"ip": "", "username": username, "password": password, "keys": keys,
+                                         "func": "host", "sync_threshold": sync_threshold,
+                                         "chunk_size": chunk_size, "checkpoint_dir": checkpoint_dir,
+                                         "workers": workers},
+                                        ("ip", "username", "password", "keys", "func", "sync_threshold",
+                                         "chunk_size", "checkpoint_dir", "workers"),
                                         kwargs.get("thread"))
         return True
     # Переменные
@@ -298,12 +414,20 @@ def upload_keys_from_eqm_file(
         print("Ошибка загрузки на %s" % ip)
         return False
 
-    print("Загрузка в модуль ключей с панели")
-    keys_module.load_keys_from_panel()
-    print("Загрузка в модуль ключей из файла")
-    keys_module.loads_keys(keys, "KEYSTRING")
-    print("Загрузка ключей на панель")
-    keys_module.upload_keys()
+    checkpoint = None
+    if chunk_size:
+        checkpoint = _get_checkpoint_path(checkpoint_dir, "eqmup", ip)
+        if keys_module.load_import_checkpoint(checkpoint) is not None:
+            print("Продолжение прерванной загрузки ключей на панель %s" % ip)
+            result = keys_module.upload_keys_chunked(checkpoint=checkpoint, max_workers=workers or 1)
+            print("Загружено ключей: %s, с ключа %s" % (result["total"], result["resumed_from"] + 1))
+
+    print("Синхронизация ключей панели с файлом")
+    result = keys_module.sync_keys(keys, delete=False, threshold=sync_threshold,
+                                   chunk_size=chunk_size, checkpoint=checkpoint,
+                                   max_workers=workers or 1)
+    print("Добавлено ключей: %s, обновлено: %s, способ загрузки: %s" % (
+        result["added"], result["updated"], result["mode"]))
 
     print("Файл с ключами успешно загружен на панель %s" % ip)
     return True
@@ -362,6 +486,9 @@ def dump_keys_to_json(
                                         kwargs.get("thread"))
         path_collection = []
         for item in output:
+            if isinstance(item[1], dict) and "Error" in item[1]:
+                print("Ошибка выгрузки ключей с %s: %s" % (item[0]['ip'], item[1]["Error"]))
+                continue
             path_collection.append(_save_dump(item[0]['ip'], item[0]['filepath'], item[1]))
 
         if kwargs['archiveted']:
@@ -399,6 +526,9 @@ def load_keys_from_json(
     filepath=None,
     keys=None,
     func="host",
+    workers=None,
+    chunk_size=None,
+    checkpoint_dir=None,
     **kwargs
 ):
     """
@@ -411,6 +541,16 @@ def load_keys_from_json(
         filepath (str): Путь к файлу. По умолчанию None.
         keys (dict): Форматировнный словарь ключей. По умолчанию None.
         func (str): режим работы доступны host | string | list. По умолчанию "host".
+        workers (int): если указан без chunk_size, ключи добавляются на
+            панель по одному в workers потоков вместо загрузки базы через
+            import, ключи панели сохраняются. С chunk_size - количество
+            потоков добавления ключей при продолжении загрузки частями.
+            По умолчанию None.
+        chunk_size (int): если указан, база загружается частями по
+            chunk_size ключей с проверкой каждой части, прерванная загрузка
+            продолжается при следующем запуске. По умолчанию None.
+        checkpoint_dir (str): каталог файлов состояния загрузки частями.
+            По умолчанию текущий каталог.
         kwargs (dict): оставшиеся аргументы режимов работ
 
     Returns:
@@ -430,20 +570,48 @@ def load_keys_from_json(
     if func in ("string", "list"):
         output = process_host_arguments(load_keys_from_json,
                                         kwargs.get("csvpath", kwargs.get("string")),
-                                        {"ip": "", "username": username, "password": password, "keys": keys, "func": "host"},
-                                        ("ip", "username", "password", "keys", "func"),
+                                        {"ip": "", "username": username, "password": password, "keys": keys,
+                                         "func": "host", "workers": workers,
+                                         "chunk_size": chunk_size, "checkpoint_dir": checkpoint_dir},
+                                        ("ip", "username", "password", "keys", "func", "workers",
+                                         "chunk_size", "checkpoint_dir"),
                                         kwargs.get("thread"))
 
     try:
         print("Создание модуля ключей на основе типа панели %s" % ip)
         keys_module = create_key_module_based_on_panel_type(ip, username, password)
 
+        if workers and not chunk_size:
+            print("Загрузка в модуль ключей из файла")
+            keys_module.loads_keys(keys, "KEYPARAMS")
+            print("Добавление ключей на панель по одному")
+            result = keys_module.slow_upload_keys(max_workers=workers, retries=2)
+            print("Добавлено ключей: %s, с ошибкой: %s" % (len(result["succeeded"]), len(result["failed"])))
+            for key_value, error in result["failed"].items():
+                print("Ошибка добавления ключа %s: %s" % (key_value, error))
+            return not result["failed"]
+
+        checkpoint = None
+        if chunk_size:
+            checkpoint = _get_checkpoint_path(checkpoint_dir, "lj", ip)
+            if keys_module.load_import_checkpoint(checkpoint) is not None:
+                print("Продолжение прерванной загрузки ключей на панель %s" % ip)
+                result = keys_module.upload_keys_chunked(checkpoint=checkpoint, max_workers=workers or 1)
+                print("Загружено ключей: %s, с ключа %s" % (result["total"], result["resumed_from"] + 1))
+                print("Ключи успешно загружены на панель")
+                return True
+
         print("Загрузка в модуль ключей с панели")
         keys_module.load_keys_from_panel()
         print("Загрузка в модуль ключей из файла")
         keys_module.loads_keys(keys, "KEYPARAMS")
-        print("Загрузка ключей на панель")
-        keys_module.upload_keys()
+        if chunk_size:
+            print("Загрузка ключей на панель частями по %s" % chunk_size)
+            keys_module.upload_keys_chunked(chunk_size=chunk_size, checkpoint=checkpoint,
+                                            max_workers=workers or 1)
+        else:
+            print("Загрузка ключей на панель")
+            keys_module.upload_keys()
     except:
         print("Ошибка загрузки ключей на панель, возможно ключи загрузились не полностью")
         return False
@@ -741,6 +909,15 @@ def parse_arguments():
     # Создание общего парсера для всех типов работы команды
     general_parser_load = argparse.ArgumentParser(add_help=False)
     general_parser_load.add_argument("filepath", help="Путь к JSON файлу ключей")
+    general_parser_load.add_argument("--workers", type=int, default=None,
+                                     help=("Добавлять ключи по одному в указанное количество потоков"
+                                           " вместо загрузки базы через import. С --chunk-size -"
+                                           " потоков добавления ключей при продолжении загрузки."))
+    general_parser_load.add_argument("--chunk-size", dest="chunk_size", type=int, default=None,
+                                     help=("Загружать базу частями по указанному количеству ключей"
+                                           " с продолжением прерванной загрузки."))
+    general_parser_load.add_argument("--checkpoint-dir", dest="checkpoint_dir", default=".",
+                                     help="Каталог файлов состояния загрузки частями.")
 
     # Типы работы lj
     load_subparsers = parser_load.add_subparsers(title="Доступные типы работы")
@@ -790,6 +967,16 @@ def parse_arguments():
     # Создание общего парсера для всех типов работы команды
     general_parser_eqmup = argparse.ArgumentParser(add_help=False)
     general_parser_eqmup.add_argument("filepath", help="Путь к EQM файлу ключей")
+    general_parser_eqmup.add_argument("--sync-threshold", dest="sync_threshold", type=int, default=None,
+                                      help=("Количество изменений, до которого ключи загружаются по одному,"
+                                            " при большем количестве база загружается целиком."))
+    general_parser_eqmup.add_argument("--chunk-size", dest="chunk_size", type=int, default=None,
+                                      help=("Загружать базу частями по указанному количеству ключей"
+                                            " с продолжением прерванной загрузки."))
+    general_parser_eqmup.add_argument("--checkpoint-dir", dest="checkpoint_dir", default=".",
+                                      help="Каталог файлов состояния загрузки частями.")
+    general_parser_eqmup.add_argument("--workers", type=int, default=None,
+                                      help="Потоков добавления ключей при продолжении загрузки частями.")
 
     # Типы работы eqmup
     eqmup_subparsers = parser_eqmup.add_subparsers(title="Доступные типы работы")
@@ -17,6 +17,7 @@ from beward_cgi.display import DisplayModule
 from beward_cgi.extrfid import ExtrfidModule
 from beward_cgi.gate import GateModule
 from beward_cgi.general.client import BewardClient
+from beward_cgi.general.pool import SESSION_POOL
 from beward_cgi.general.dump_creator import JSONDumpFormatter, make_dumps
 from beward_cgi.https import HttpsModule
 from beward_cgi.intercom import IntercomModule
@@ -92,7 +93,8 @@ def make_dump(ip=None, username=None, password=None, formatter=JSONDumpFormatter
         password,
     )
     config = {}
-    client = BewardClient(ip=ip, login=username, password=password)
+    client = BewardClient(ip=ip, login=username, password=password,
+                          pool=SESSION_POOL)
     for module in DKS_PANEL:
         try:
             module_client = module(client=client)
@@ -0,0 +1,686 @@
+#!/usr/bin/python
+# coding=utf8
+import argparse
+import asyncio
+from base64 import b64decode
+from collections import Counter, OrderedDict
+from logging import getLogger
+from random import Random
+from threading import Thread
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LOGGER = getLogger(__name__)
+
+"""Симулятор панелей Beward для тестов и замеров без оборудования.
+
+Каждая виртуальная панель слушает свой порт на loopback и отвечает на cgi,
+которые использует пакет: *_cgi get/set, rfid_cgi и mifare_cgi
+export/import/add/delete/update, apartment_cgi list/get/set, ячейки
+intercomdu_cgi, снимки images_cgi и загрузку upgrade_cgi. Задержка, разброс
+задержки и доля ошибок задаются для всего симулятора.
+
+Пример:
+    with PanelSimulator(panels=100, latency=0.02) as simulator:
+        for address in simulator.addresses:
+            ...
+
+Запуск из консоли:
+    python beward_toolkit/scripts/simulator.py --panels 1000 --csvpath hosts.csv
+"""
+
+MIFARE_PATTERN = (
+    "Key",
+    "Type",
+    "ProtectedMode",
+    "CipherIndex",
+    "NewCipherEnable",
+    "NewCipherIndex",
+    "Code",
+    "Sector",
+    "Apartment",
+    "Owner",
+    "AutoPersonalize",
+    "Service",
+)
+RFID_PATTERN = ("Key", "Apartment")
+MIFARE_DEFAULTS = {"Type": "1", "Sector": "1", "Owner": ""}
+
+DEFAULT_PARAMS = {
+    "cgi-bin/systeminfo_cgi": OrderedDict((
+        ("DeviceID", "1"),
+        ("DeviceModel", "DKS15122"),
+        ("HardwareVersion", "1.2.2"),
+        ("SoftwareVersion", "2.3.9.8.3"),
+        ("SoftwareVersionDate", "2023-05-10"),
+        ("UpTime", "00:01:00"),
+    )),
+    "cgi-bin/sip_cgi": OrderedDict((
+        ("AccUser1", "100"),
+        ("AccPassword1", "secret"),
+        ("AccEnable1", "on"),
+        ("RegServerUrl1", "sip.local"),
+        ("RegServerPort1", "5060"),
+    )),
+    "cgi-bin/ntp_cgi": OrderedDict((
+        ("Enable", "on"),
+        ("ServerAddress", "pool.ntp.org"),
+        ("Timezone", "21"),
+    )),
+    "cgi-bin/textoverlay_cgi": OrderedDict((
+        ("Title", "GMC-000000"),
+        ("TitleEnable", "on"),
+        ("DateEnable", "on"),
+        ("TimeEnable", "on"),
+    )),
+    "cgi-bin/rfid_cgi": OrderedDict((
+        ("Enable", "on"),
+        ("RegEnable", "off"),
+    )),
+    "cgi-bin/mifare_cgi": OrderedDict((
+        ("Enable", "on"),
+        ("ScanMode", "0"),
+    )),
+    "cgi-bin/extrfid_cgi": OrderedDict((
+        ("Enable", "off"),
+    )),
+    "cgi-bin/intercom_cgi": OrderedDict((
+        ("DoorOpenTime", "5"),
+        ("ConciergeApartment", "0"),
+    )),
+}
+KEY_CGI = {
+    "cgi-bin/rfid_cgi": "RFID",
+    "cgi-bin/mifare_cgi": "MIFARE",
+    "cgi-bin/extrfid_cgi": "MIFARE",
+}
+APARTMENT_PARAMS = (
+    ("DoorCode", "0"),
+    ("DoorCodeActive", "off"),
+    ("RegCode", "0"),
+    ("RegCodeActive", "off"),
+    ("BlockCMS", "off"),
+    ("PhonesActive", "off"),
+    ("Phone1", ""),
+)
+USER_CAPABILITIES = ",".join(["1"] * 32)
+# Минимальный корректный JPEG, дополняется до заданного размера
+JPEG_HEAD = bytes.fromhex("ffd8ffe000104a46494600010100000100010000")
+JPEG_TAIL = bytes.fromhex("ffd9")
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    500: "Internal Server Error",
+}
+
+
+def make_jpeg(size):
+    """Заглушка снимка заданного размера."""
+    return JPEG_HEAD + b"\x00" * max(0, size - len(JPEG_HEAD) - 2) + JPEG_TAIL
+
+
+def make_key_string(params, format_type):
+    """Строка ключа в формате выгрузки панели."""
+    pattern = MIFARE_PATTERN if format_type == "MIFARE" else RFID_PATTERN
+    return ",".join(
+        params.get(name, MIFARE_DEFAULTS.get(name, "0")) for name in pattern
+    )
+
+
+def parse_multipart_file(content_type, body):
+    """Содержимое первого файла из тела multipart/form-data.
+
+    Returns:
+        bytes или None, если файл не найден.
+    """
+    boundary = None
+    for item in content_type.split(";"):
+        name, _, value = item.strip().partition("=")
+        if name == "boundary":
+            boundary = value.strip('"').encode("latin-1")
+    if not boundary:
+        return None
+
+    for part in body.split(b"--" + boundary):
+        head, separator, data = part.partition(b"\r\n\r\n")
+        if separator and b"filename=" in head:
+            return data[:-2] if data.endswith(b"\r\n") else data
+    return None
+
+
+class VirtualPanel(object):
+    """Состояние одной виртуальной панели."""
+
+    def __init__(
+        self,
+        number=0,
+        login="admin",
+        password="admin",
+        key_type="MIFARE",
+        keys=100,
+        apartments=10,
+        kkm_tables=1,
+        kkm_dozens=10,
+        kkm_units=10,
+        image_size=64 * 1024,
+    ):
+        """Инициализация панели.
+
+        Args:
+            number (int): номер панели, используется в идентификаторах.
+            login (str): имя администратора.
+            password (str): пароль администратора.
+            key_type (str): "MIFARE" или "RFID", второй cgi ключей
+                отвечает "is not defined".
+            keys (int): количество ключей в базе.
+            apartments (int): количество квартир.
+            kkm_tables (int): количество таблиц коммутатора.
+            kkm_dozens (int): количество десятков в таблице.
+            kkm_units (int): количество единиц в десятке.
+            image_size (int): размер снимка в байтах.
+        """
+        self.number = number
+        self.login = login
+        self.password = password
+        self.key_type = key_type
+        self.image = make_jpeg(image_size)
+        self.requests = Counter()
+        self.params = {cgi: OrderedDict(params) for cgi, params in DEFAULT_PARAMS.items()}
+        self.params["cgi-bin/systeminfo_cgi"]["DeviceID"] = str(number)
+        self.params["cgi-bin/textoverlay_cgi"]["Title"] = "GMC-{:06d}".format(number)
+        self.users = OrderedDict(((login, USER_CAPABILITIES),))
+        self.keys = OrderedDict()
+        for num in range(keys):
+            uid = "{:014X}".format(0x41A1D8B3 + number * 1000000 + num)
+            self.keys[uid] = {"Key": uid, "Apartment": str(num % max(apartments, 1) + 1)}
+        self.apartments = OrderedDict()
+        for num in range(1, apartments + 1):
+            self.apartments[str(num)] = OrderedDict(APARTMENT_PARAMS)
+        self.kkm_type = "Metakom"
+        self.kkm = [
+            [["0"] * kkm_units for _ in range(kkm_dozens)] for _ in range(kkm_tables)
+        ]
+
+    def check_auth(self, header):
+        if not header or not header.startswith("Basic "):
+            return False
+        try:
+            login, _, password = b64decode(header[6:]).decode("UTF-8").partition(":")
+        except ValueError:
+            return False
+        return login == self.login and password == self.password
+
+    def handle(self, method, cgi, params, headers, body):
+        """Обработка запроса к cgi панели.
+
+        Returns:
+            tuple: код ответа, тип содержимого и тело ответа.
+        """
+        action = params.get("action")
+        self.requests[(cgi, action)] += 1
+
+        if cgi in KEY_CGI:
+            return self._keys(cgi, action, params, headers, body)
+        if cgi == "cgi-bin/apartment_cgi":
+            return self._apartment(action, params)
+        if cgi == "cgi-bin/intercomdu_cgi":
+            return self._intercomdu(action, params)
+        if cgi == "cgi-bin/images_cgi":
+            return 200, "image/jpeg", self.image
+        if cgi == "cgi-bin/date_cgi" and action == "get":
+            return self._text("Oct 18, 2026 12:00:00 21 pool.ntp.org")
+        if cgi == "cgi-bin/pwdgrp_cgi":
+            return self._users(action, params)
+        if cgi in ("cgi-bin/upgrade_cgi", "cgi-bin/restart_cgi",
+                   "cgi-bin/factorydefault_cgi", "cgi-bin/hardfactorydefault_cgi"):
+            return self._text("OK")
+        if not cgi:
+            return self._text("")
+        return self._generic(cgi, action, params)
+
+    @staticmethod
+    def _text(text, code=200):
+        return code, "text/plain", text.encode("UTF-8")
+
+    @staticmethod
+    def _lines(items):
+        return "".join("{}={}\r\n".format(key, value) for key, value in items)
+
+    @staticmethod
+    def _updates(params):
+        return [(key, value) for key, value in params.items() if key != "action"]
+
+    def _generic(self, cgi, action, params):
+        values = self.params.setdefault(cgi, OrderedDict(Enable="on"))
+        if action == "get":
+            return self._text(self._lines(values.items()))
+        if action == "set":
+            values.update(self._updates(params))
+            return self._text("OK")
+        return self._text("Invalid action", 400)
+
+    def _keys(self, cgi, action, params, headers, body):
+        format_type = KEY_CGI[cgi]
+        # Внешний считыватель работает с базой ключей панели в формате MIFARE
+        if format_type != self.key_type and cgi != "cgi-bin/extrfid_cgi":
+            return self._text("Error: {} is not defined".format(cgi.split("/")[-1]))
+
+        if action == "get":
+            return self._generic(cgi, action, params)
+        if action == "set":
+            return self._generic(cgi, action, params)
+        if action == "export":
+            return self._text("".join(
+                make_key_string(key, format_type) + "\r\n" for key in self.keys.values()
+            ))
+        if action == "import":
+            data = parse_multipart_file(headers.get("content-type", ""), body)
+            if data is None:
+                return self._text("File not found", 400)
+            keys = OrderedDict()
+            for line in data.decode("UTF-8").splitlines():
+                if not line.strip():
+                    continue
+                values = line.split(",")
+                pattern = RFID_PATTERN if len(values) == 2 else MIFARE_PATTERN
+                values = dict(zip(pattern, values))
+                keys[values["Key"]] = values
+            self.keys = keys
+            return self._text("OK")
+        if action in ("add", "update"):
+            uid = params.get("Key")
+            if not uid:
+                return self._text("Key is not found", 400)
+            if action == "update" and uid not in self.keys:
+                return self._text("Key not exists")
+            key = self.keys.get(uid, {})
+            key.update(self._updates(params))
+            self.keys[uid] = key
+            return self._text("OK")
+        if action == "delete":
+            return self._delete_keys(params)
+        return self._text("Invalid action", 400)
+
+    def _delete_keys(self, params):
+        if "Index" in params:
+            try:
+                uid = list(self.keys)[int(params["Index"])]
+            except (ValueError, IndexError):
+                return self._text("Invalid index", 400)
+            del self.keys[uid]
+        elif "Key" in params:
+            if self.keys.pop(params["Key"], None) is None:
+                return self._text("Key not exists")
+        elif "Apartment" in params:
+            self.keys = OrderedDict(
+                (uid, key)
+                for uid, key in self.keys.items()
+                if key.get("Apartment") != params["Apartment"]
+            )
+        else:
+            self.keys.clear()
+        return self._text("OK")
+
+    def _apartment(self, action, params):
+        if action == "list":
+            return self._text(self._lines(
+                ("Number{}".format(num), number)
+                for num, number in enumerate(self.apartments)
+            ))
+
+        number = params.get("Number")
+        if action == "get":
+            apartment = self.apartments.get(number)
+            if apartment is None:
+                return self._text("Apartment not found", 400)
+            return self._text(self._lines(
+                [("Number", number)] + list(apartment.items()),
+            ))
+        if action == "set":
+            if not number:
+                return self._text("Number is not found", 400)
+            apartment = self.apartments.setdefault(number, OrderedDict(APARTMENT_PARAMS))
+            for key, value in self._updates(params):
+                if key == "Number":
+                    continue
+                if value == "generate":
+                    value = "{:05d}".format(Random().randrange(100000))
+                apartment[key] = value
+            return self._text("OK")
+        if action == "delete":
+            self.apartments.pop(number, None)
+            return self._text("OK")
+        return self._text("Invalid action", 400)
+
+    def _intercomdu(self, action, params):
+        if action == "list":
+            return self._text(self._lines((("Type", self.kkm_type),)))
+        if action == "fill":
+            for table in self.kkm:
+                for dozen in table:
+                    dozen[:] = ["0"] * len(dozen)
+            return self._text("OK")
+
+        parent, cell, index = None, self.kkm, None
+        for name in ("Index", "Dozens", "Units"):
+            if name not in params:
+                break
+            try:
+                index = int(params[name])
+                if index < 0:
+                    raise IndexError(index)
+                parent, cell = cell, cell[index]
+            except (ValueError, IndexError):
+                return self._text("Invalid {}".format(name), 400)
+
+        if action == "get":
+            return self._text(cell if isinstance(cell, str) else "")
+        if action == "set":
+            if not isinstance(cell, str):
+                return self._text("Units is not found", 400)
+            parent[index] = params.get("Apartment", "0")
+            return self._text("OK")
+        return self._text("Invalid action", 400)
+
+    def _users(self, action, params):
+        if action == "get":
+            return self._text("Users\r\n" + "".join(
+                "{}:{}\r\n".format(user, capabilities)
+                for user, capabilities in self.users.items()
+            ))
+        if action in ("add", "update"):
+            username = params.get("username")
+            if not username:
+                return self._text("User is not found", 400)
+            self.users[username] = params.get(
+                "capabilities",
+                self.users.get(username, USER_CAPABILITIES),
+            )
+            return self._text("OK")
+        if action == "remove":
+            self.users.pop(params.get("username"), None)
+            return self._text("OK")
+        return self._text("Invalid action", 400)
+
+
+class PanelSimulator(object):
+    """Набор виртуальных панелей на портах loopback.
+
+    Серверы работают на одном event loop. Методы start и stop используются
+    внутри работающего loop, а контекстный менеджер запускает loop в
+    отдельном потоке для синхронных клиентов.
+    """
+
+    def __init__(
+        self,
+        panels=1,
+        host="127.0.0.1",
+        base_port=0,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        seed=None,
+        **panel_kwargs
+    ):
+        """Инициализация симулятора.
+
+        Args:
+            panels (int): количество панелей.
+            host (str): адрес прослушивания.
+            base_port (int): порт первой панели, следующие панели занимают
+                порты подряд. 0 - свободные порты выбирает система.
+            latency (float): задержка ответа в секундах.
+            jitter (float): разброс задержки в секундах, задержка равномерно
+                распределена в latency +- jitter.
+            error_rate (float): доля запросов, на которые панель отвечает 500.
+            seed (int, optional): начальное значение генератора случайных чисел.
+            **panel_kwargs: параметры VirtualPanel.
+        """
+        self.host = host
+        self.base_port = base_port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = Random(seed)
+        self.panels = [VirtualPanel(num, **panel_kwargs) for num in range(panels)]
+        self.addresses = []
+        self.errors = 0
+        self._servers = []
+        self._connections = {}
+        self._loop = None
+        self._thread = None
+
+    def __len__(self):
+        return len(self.panels)
+
+    @property
+    def requests(self):
+        """Количество запросов ко всем панелям по (cgi, action)."""
+        total = Counter()
+        for panel in self.panels:
+            total.update(panel.requests)
+        return total
+
+    def reset_stats(self):
+        self.errors = 0
+        for panel in self.panels:
+            panel.requests.clear()
+
+    async def start(self):
+        """Запуск серверов всех панелей."""
+        raise_nofile_limit(len(self.panels) * 2 + 256)
+        for num, panel in enumerate(self.panels):
+            port = self.base_port + num if self.base_port else 0
+            server = await asyncio.start_server(
+                lambda reader, writer, panel=panel: self._serve(panel, reader, writer),
+                self.host,
+                port,
+                backlog=512,
+            )
+            port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+            self.addresses.append("{}:{}".format(self.host, port))
+        LOGGER.debug("Запущено {} виртуальных панелей.".format(len(self.panels)))
+        return self
+
+    async def stop(self):
+        """Остановка серверов и открытых соединений."""
+        for server in self._servers:
+            server.close()
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+        self.addresses = []
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    def _get_delay(self):
+        if not self.latency and not self.jitter:
+            return 0
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    async def _serve(self, panel, reader, writer):
+        """Обработка соединения HTTP/1.1 с keep-alive."""
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                code, content_type, content = await self._respond(
+                    panel,
+                    method,
+                    target,
+                    headers,
+                    body,
+                )
+                keep_alive = headers.get("connection", "").lower() != "close"
+                head = [
+                    "HTTP/1.1 {} {}".format(code, REASONS.get(code, "")),
+                    "Content-Type: {}".format(content_type),
+                    "Content-Length: {}".format(len(content)),
+                    "Connection: {}".format("keep-alive" if keep_alive else "close"),
+                ]
+                if code == 401:
+                    head.append('WWW-Authenticate: Basic realm="Beward"')
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _respond(self, panel, method, target, headers, body):
+        delay = self._get_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if not panel.check_auth(headers.get("authorization")):
+            return 401, "text/plain", b"Unauthorized"
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return 500, "text/plain", b"Internal Server Error"
+
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        return panel.handle(method, url.path.lstrip("/"), params, headers, body)
+
+
+async def read_request(reader):
+    """Чтение одного HTTP запроса.
+
+    Returns:
+        tuple: метод, путь, заголовки с именами в нижнем регистре и тело,
+        или None, если клиент закрыл соединение.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if not size:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    else:
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, target, headers, body
+
+
+def raise_nofile_limit(required):
+    """Поднять лимит открытых файлов для тысяч слушающих сокетов."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= required:
+        return
+    limit = required if hard == resource.RLIM_INFINITY else min(required, hard)
+    if limit > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    if limit < required:
+        LOGGER.warning(
+            "Лимит открытых файлов {} меньше необходимого {}.".format(limit, required),
+        )
+
+
+async def serve(args):
+    simulator = PanelSimulator(
+        panels=args.panels,
+        host=args.host,
+        base_port=args.base_port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        login=args.username,
+        password=args.password,
+        key_type=args.key_type,
+        keys=args.keys,
+    )
+    await simulator.start()
+    if args.csvpath:
+        with open(args.csvpath, "w", encoding="UTF-8") as file:
+            file.write("IP;Name\n")
+            for num, address in enumerate(simulator.addresses):
+                file.write("{};panel-{}\n".format(address, num))
+        print("Список адресов сохранен в %s" % args.csvpath)
+    print("Запущено %s панелей: %s ... %s" % (
+        len(simulator),
+        simulator.addresses[0],
+        simulator.addresses[-1],
+    ))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Симулятор панелей Beward для тестов и замеров",
+    )
+    parser.add_argument("--panels", type=int, default=1, help="Количество панелей")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес прослушивания")
+    parser.add_argument("--base-port", type=int, default=0,
+                        help="Порт первой панели, 0 - свободные порты")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки, с")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Доля ответов с ошибкой 500")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Начальное значение генератора случайных чисел")
+    parser.add_argument("-u", "--username", default="admin", help="Имя администратора")
+    parser.add_argument("-p", "--password", default="admin", help="Пароль администратора")
+    parser.add_argument("--key-type", choices=["RFID", "MIFARE"], default="MIFARE",
+                        help="Тип ключей панелей")
+    parser.add_argument("--keys", type=int, default=100, help="Количество ключей")
+    parser.add_argument("--csvpath", default=None,
+                        help="Сохранить адреса панелей в CSV файл (IP;Name)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
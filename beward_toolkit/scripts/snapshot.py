@@ -17,9 +17,11 @@ if str(Path(__file__).resolve().parent.parent.parent) not in path:
 from interface import HOST_PARSER, CREDENTIALS_PARSER
 from interface import LIST_PARSER, STRING_PARSER, ZIP_PARSER
 from interface import get_epiloge_message
-from general_solutions import ping, run_command_to_seqens
+from general_solutions import iter_probe_hosts, run_command_to_seqens
 from general_solutions import create_zip, get_gmc_id
 from beward_cgi.general.client import BewardClient
+from beward_cgi.general.cache import IN_FLIGHT, RESPONSE_CACHE
+from beward_cgi.general.pool import SESSION_POOL
 from beward_cgi.images import ImagesModule
 from beward_cgi.date import BewardTimeZone, DateModule
 from beward_cgi.ntp import NtpModule
@@ -168,7 +170,8 @@ def get_snapshot(
     )
     # Переменные
     name_format = "{name}.{file_format}"
-    client = BewardClient(ip=ip, login=username, password=password)
+    client = BewardClient(ip=ip, login=username, password=password,
+                          pool=SESSION_POOL, cache=RESPONSE_CACHE, flights=IN_FLIGHT)
     image_client = ImagesModule(client=client)
     ntp_client = NtpModule(client=client)
     date_client = DateModule(client=client)
@@ -240,37 +243,43 @@ def get_snapshot_hosts(hosts=None, username=None, password=None, thread_num=1,
         Нет возвращаемых значений. Но создаются файлы в переданной деректории.
 
     """
-    output = []
-    seqens = []
     if hosts is None or not hosts:
         raise ValueError("Hosts not specified")
 
+    names = {}
     for item in hosts:
         if isinstance(item, dict):
             host = item.get("IP", "")
             name = item.get("Name", "")
-        elif isinstance(host, str):
+        elif isinstance(item, str):
             name = ''
             host = item
         else:
-            ValueError("Host must be str or dict")
-
-        if not ping(host):
-            continue
-
-        if changed_date is not None or not changed_date:
-            if changed_date[0][1]:
+            raise ValueError("Host must be str or dict")
+        names.setdefault(host, []).append(name)
+
+    def _iter_seqens(changed_date):
+        # Доступность проверяется одновременно, снимок снимается сразу
+        # после ответа устройства
+        for host, reachable in iter_probe_hosts(
+            [host for host, host_names in names.items() for _ in host_names],
+        ):
+            name = names[host].pop(0)
+            if not reachable:
+                continue
+
+            if changed_date and changed_date[0][1]:
                 # Если время в дате сгенерировано рандоимно, оно генерируеться повторно
                 date = datetime.strftime(changed_date[0][0], "%d.%m.%Y")
                 date = _get_date_from_datestring(date)
                 changed_date = tuple([date, changed_date[1]])
 
-        host_seqens = (host, username, password, channel,
-                       file_format, save_path, changed_date, name)
-        seqens.append(host_seqens)
-    output += run_command_to_seqens(
+            yield (host, username, password, channel,
+                   file_format, save_path, changed_date, name)
+
+    output = run_command_to_seqens(
         get_snapshot,
-        seqens,
+        _iter_seqens(changed_date),
         ("ip", "username", "password", "channel", "file_format",
          "save_path", "changed_date", "snapshot_name"),
         thread_num,
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+# coding=utf8
+import pytest
+
+from beward_cgi.general.client import BewardClient
+from beward_cgi.general.module import BewardIntercomModuleError
+from beward_cgi.intercomdu import DIMENSIONS_CACHE, IntercomduModule, find_first_missing
+from beward_toolkit.scripts.simulator import PanelSimulator
+
+"""Размеры и загрузка матрицы коммутатора IntercomduModule.
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_dimensions_cache():
+    DIMENSIONS_CACHE.clear()
+    yield
+    DIMENSIONS_CACHE.clear()
+
+
+def make_module(simulator):
+    client = BewardClient(simulator.addresses[0], "admin", "admin")
+    return IntercomduModule(client=client)
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 7, 8, 100])
+def test_find_first_missing(count):
+    assert find_first_missing(lambda index: index < count) == count
+
+
+def test_dimensions_match_panel():
+    with PanelSimulator(kkm_tables=2, kkm_dozens=3, kkm_units=4) as simulator:
+        module = make_module(simulator)
+        assert module._get_dimensions() == (2, 3, 4)
+        module.load_params()
+        assert module.params["Matrix"].shape == (2, 3, 4)
+        assert not module.matrix_errors
+
+
+def test_missing_matrix_raises_module_error():
+    with PanelSimulator(kkm_tables=0) as simulator:
+        module = make_module(simulator)
+        with pytest.raises(BewardIntercomModuleError):
+            module.load_params()
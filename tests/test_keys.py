@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# coding=utf8
+import sys
+from importlib import import_module
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+"""Разбор файлов ключей EQM скрипта beward_toolkit.scripts.keys.
+"""
+
+# Скрипты beward_toolkit импортируют соседние модули без пакета
+SCRIPTS_DIR = str(Path(__file__).resolve().parent.parent / "beward_toolkit" / "scripts")
+RFID_FILE = (
+    "[KEYS]\r\n"
+    "KeyValue1=000000C2137B42\r\nKeyApartment1=0\r\nKeyIndex1=0\r\n"
+    "KeyValue2=000000C21252E2\r\nKeyApartment2=5\r\nKeyIndex2=1\r\n"
+)
+MIFARE_RECORD = (
+    "KeyValue{0}={1}\nType{0}=1\nProtectedMode{0}=off\nCipherIndex{0}=0\n"
+    "NewCipherEnable{0}=on\nNewCipherIndex{0}=0\nCode{0}=0\nSector{0}=1\n"
+    "Apartment{0}={2}\nOwner{0}=Jonathon\nAutoPersonalize{0}=off\nService{0}=off\n"
+    "Index{0}={0}\n"
+)
+
+
+@pytest.fixture(scope="module")
+def keys():
+    """Скрипт keys с заглушкой настроек пакета.
+
+    Настоящие config.settings открывают базу паролей KeePass, для разбора
+    файлов ключей она не нужна.
+    """
+    settings = ModuleType("config.settings")
+    settings.HOSTS = []
+    settings.PASSWORDS = {"entries_groups": {}}
+    settings.PASSWORDS_BASE = None
+    config = ModuleType("config")
+    config.settings = settings
+    loaded = set(sys.modules)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.syspath_prepend(SCRIPTS_DIR)
+        monkeypatch.setitem(sys.modules, "config", config)
+        monkeypatch.setitem(sys.modules, "config.settings", settings)
+        yield import_module("keys")
+    # Модули, загруженные с заглушкой, не должны попасть в другие тесты
+    for name in set(sys.modules) - loaded:
+        sys.modules.pop(name, None)
+
+
+def write(tmp_path, content, mode="w"):
+    filepath = tmp_path / "keys.conf"
+    if mode == "wb":
+        filepath.write_bytes(content)
+    else:
+        filepath.write_text(content, encoding="UTF-8", newline="")
+    return str(filepath)
+
+
+def test_rfid_file(keys, tmp_path):
+    filepath = write(tmp_path, RFID_FILE)
+    assert keys.format_keysfile_to_keystring_array(filepath) == (
+        ("000000C2137B42,0", "000000C21252E2,5"),
+        "RFID",
+    )
+
+
+def test_mifare_file_flags(keys, tmp_path):
+    filepath = write(tmp_path, "[KEYS]\n" + MIFARE_RECORD.format(1, "00000041A1D8B3", 7))
+    assert keys.format_keysfile_to_keystring_array(filepath) == (
+        ("00000041A1D8B3,1,0,0,1,0,0,1,7,Jonathon,0,0",),
+        "MIFARE",
+    )
+
+
+def test_non_contiguous_records(keys, tmp_path):
+    filepath = write(tmp_path, (
+        "[KEYS]\n"
+        "KeyValue1=000000C2137B42\nKeyValue2=000000C21252E2\n"
+        "KeyApartment1=3\nKeyApartment2=5\n"
+        "KeyIndex1=0\nKeyIndex2=1\n"
+    ))
+    assert keys.format_keysfile_to_keystring_array(filepath) == (
+        ("000000C2137B42,3", "000000C21252E2,5"),
+        "RFID",
+    )
+
+
+def test_empty_file(keys, tmp_path):
+    filepath = write(tmp_path, "")
+    assert keys.format_keysfile_to_keystring_array(filepath) == ((), None)
+    assert keys._load_keys(filepath, "CONF") is False
+
+
+def test_load_keys_handles_decode_error(keys, tmp_path):
+    filepath = write(tmp_path, RFID_FILE.encode("UTF-8") + b"KeyValue3=\xff\xfe\r\n", "wb")
+    assert keys._load_keys(filepath, "CONF") is False
+
+
+def test_load_keys_returns_table(keys, tmp_path):
+    filepath = write(tmp_path, RFID_FILE)
+    table = keys._load_keys(filepath, "CONF")
+    assert table.get_key_strings("RFID") == ["000000C2137B42,0", "000000C21252E2,5"]
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# coding=utf8
+from beward_cgi.date import DateModule
+from beward_cgi.general.client import BewardClient
+from beward_cgi.ntp import NtpModule
+from beward_toolkit.scripts.simulator import PanelSimulator
+
+"""Отправка измененных параметров из set_params.
+"""
+
+
+def make_modules(simulator):
+    client = BewardClient(simulator.addresses[0], "admin", "admin")
+    ntp = NtpModule(client=client)
+    date = DateModule(client=client)
+    ntp.load_params()
+    date.load_params()
+    return ntp, date
+
+
+def test_set_params_skips_unchanged():
+    with PanelSimulator() as simulator:
+        ntp, _ = make_modules(simulator)
+        simulator.reset_stats()
+        assert ntp.set_params()
+        assert simulator.requests[("cgi-bin/ntp_cgi", "set")] == 0
+        assert ntp.get_changed_params() == {}
+
+
+def test_date_set_params_invalidates_ntp():
+    with PanelSimulator() as simulator:
+        ntp, date = make_modules(simulator)
+        date.set_params()
+        assert ntp.get_changed_params() == ntp.get_params()
+        simulator.reset_stats()
+        ntp.set_params()
+        assert simulator.requests[("cgi-bin/ntp_cgi", "set")] == 1
+        assert ntp.get_changed_params() == {}
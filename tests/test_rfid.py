@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# coding=utf8
+import pytest
+
+from beward_cgi.beward_key import Key
+from beward_cgi.general.client import BewardClient
+from beward_cgi.general.module import BewardIntercomModuleError
+from beward_cgi.rfid import RfidModule
+from beward_toolkit.scripts.simulator import PanelSimulator
+
+"""Загрузка базы ключей RfidModule на симулятор панели.
+"""
+
+KEYS = ["{:014X},{}".format(0x51A1D8B3 + num, num % 10 + 1) for num in range(50)]
+
+
+def make_module(simulator):
+    client = BewardClient(simulator.addresses[0], "admin", "admin")
+    return RfidModule(client=client)
+
+
+def test_upload_keys_from_generator():
+    with PanelSimulator(key_type="RFID", keys=5) as simulator:
+        module = make_module(simulator)
+        module.upload_keys(keys=(Key(line) for line in KEYS))
+        assert module.load_key_table().get_key_strings("RFID") == KEYS
+
+
+def test_keys_payload_from_generator_is_reusable():
+    with PanelSimulator(key_type="RFID", keys=5) as simulator:
+        module = make_module(simulator)
+        payload = module.make_keys_payload(Key(line) for line in KEYS)
+        assert len(payload) == len(b"".join(payload))
+        module.upload_keys(payload)
+        assert len(simulator.panels[0].keys) == len(KEYS)
+
+
+def interrupt_chunked_upload(module, checkpoint, monkeypatch):
+    """Прервать загрузку 50 ключей частями 5, 10, 20, 40, 50 на четвертой."""
+    import_keys = module._import_keys
+    calls = []
+
+    def failing_import_keys(payload, timeout=600):
+        calls.append(payload)
+        if len(calls) == 4:
+            raise BewardIntercomModuleError("Import failed")
+        return import_keys(payload, timeout)
+
+    monkeypatch.setattr(module, "_import_keys", failing_import_keys)
+    with pytest.raises(BewardIntercomModuleError):
+        module.upload_keys_chunked(KEYS, chunk_size=5, checkpoint=checkpoint, retries=0)
+    monkeypatch.setattr(module, "_import_keys", import_keys)
+    assert module.load_import_checkpoint(checkpoint)["confirmed"] == 20
+
+
+def test_upload_keys_chunked_imports_every_chunk():
+    with PanelSimulator(key_type="RFID", keys=5) as simulator:
+        module = make_module(simulator)
+        simulator.reset_stats()
+        result = module.upload_keys_chunked(KEYS, chunk_size=5)
+        assert simulator.requests[("cgi-bin/rfid_cgi", "import")] == 5
+        assert simulator.requests[("cgi-bin/rfid_cgi", "add")] == 0
+        assert result["imported"] == len(KEYS)
+        assert module.load_key_table().get_key_strings("RFID") == KEYS
+
+
+def test_upload_keys_chunked_resumes_with_add(tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "keys.json")
+    with PanelSimulator(key_type="RFID", keys=5) as simulator:
+        module = make_module(simulator)
+        interrupt_chunked_upload(module, checkpoint, monkeypatch)
+
+        simulator.reset_stats()
+        result = module.upload_keys_chunked(checkpoint=checkpoint, max_workers=4)
+        assert result["resumed_from"] == 20
+        # Ключи 21-40 прерванной части добавляются, последняя часть загружается
+        assert result["added"] == 20
+        assert simulator.requests[("cgi-bin/rfid_cgi", "import")] == 1
+        assert module.load_key_table().get_key_strings("RFID") == KEYS
+        assert not list(tmp_path.iterdir())
+
+
+def test_upload_keys_chunked_resumes_with_import(tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "keys.json")
+    with PanelSimulator(key_type="RFID", keys=5) as simulator:
+        module = make_module(simulator)
+        module.sync_threshold = 5
+        interrupt_chunked_upload(module, checkpoint, monkeypatch)
+
+        simulator.reset_stats()
+        result = module.upload_keys_chunked(checkpoint=checkpoint)
+        assert result["added"] == 0
+        assert result["imported"] == len(KEYS) - 20
+        assert simulator.requests[("cgi-bin/rfid_cgi", "import")] == 2
+        assert module.load_key_table().get_key_strings("RFID") == KEYS
+        assert not list(tmp_path.iterdir())